@@ -3,7 +3,7 @@ from .models import YoloModel
 
 @admin.register(YoloModel)
 class YoloModelAdmin(admin.ModelAdmin):
-    list_display = ("name", "base_model", "date_built", "num_params", "map", "map_5095", "size", "is_active")
+    list_display = ("name", "base_model", "date_built", "num_params", "map", "map_5095", "size", "is_active", "serve_int8")
     list_filter = ("is_active", "base_model", "date_built")
     search_fields = ("name", "base_model", "weights_path")
     actions = ["make_active"]
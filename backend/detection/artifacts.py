@@ -0,0 +1,79 @@
+# detection/artifacts.py
+from __future__ import annotations
+from typing import Tuple
+from pathlib import Path
+import os, re, time, uuid
+import numpy as np
+import cv2
+from django.conf import settings
+
+# Short-lived annotated images on disk (any uvicorn worker can serve them), fetched as raw
+# image/jpeg or image/webp instead of base64 inside the JSON payload.
+
+FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY, 90),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY, 85),
+}
+_NAME_RE = re.compile(r"^[0-9a-f]{32}\.(jpg|webp)$")
+_CONTENT_TYPES = {ext: ctype for ext, ctype, _, _ in FORMATS.values()}
+_LAST_SWEEP = 0.0
+
+def _store_dir() -> Path:
+    d = Path(getattr(settings, "YOLO_ARTIFACT_DIR", Path(settings.BASE_DIR) / "artifacts"))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+def _ttl() -> float:
+    return float(getattr(settings, "YOLO_ARTIFACT_TTL_S", 3600))
+
+def _sweep(d: Path) -> None:
+    """Delete expired artifacts; runs at most once a minute per process."""
+    global _LAST_SWEEP
+    now = time.time()
+    if now - _LAST_SWEEP < 60:
+        return
+    _LAST_SWEEP = now
+    for p in d.iterdir():
+        try:
+            if now - p.stat().st_mtime > _ttl():
+                p.unlink()
+        except OSError:
+            pass  # removed by another worker
+
+def encode_image(img_bgr: np.ndarray, fmt: str = "jpeg", max_dim: int = 0) -> bytes:
+    """JPEG/WebP bytes, downscaled so the longer side is at most max_dim (0 = full resolution)."""
+    ext, _, flag, quality = FORMATS.get(fmt, FORMATS["jpeg"])
+    h, w = img_bgr.shape[:2]
+    if max_dim and max(h, w) > max_dim:
+        r = max_dim / max(h, w)
+        img_bgr = cv2.resize(img_bgr, (max(1, round(w * r)), max(1, round(h * r))), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(ext, img_bgr, [int(flag), quality])
+    if not ok:
+        raise RuntimeError(f"Could not encode annotated image as {fmt}")
+    return buf.tobytes()
+
+def save_artifact(data: bytes, fmt: str = "jpeg") -> str:
+    """Store encoded image bytes; returns the artifact name (<token>.<ext>)."""
+    d = _store_dir()
+    _sweep(d)
+    name = f"{uuid.uuid4().hex}{FORMATS.get(fmt, FORMATS['jpeg'])[0]}"
+    tmp = d / f".{name}.tmp"
+    tmp.write_bytes(data)
+    os.replace(tmp, d / name)
+    return name
+
+def artifact_path(name: str) -> Tuple[Path, str] | None:
+    """(path, content type) of a live artifact, None when unknown/expired/malformed."""
+    if not _NAME_RE.match(name or ""):
+        return None
+    p = _store_dir() / name
+    try:
+        if time.time() - p.stat().st_mtime > _ttl():
+            return None
+    except OSError:
+        return None
+    return p, _CONTENT_TYPES[p.suffix]
+
+def artifact_url(name: str) -> str:
+    from django.urls import reverse
+    return reverse("artifact", args=[name])
@@ -0,0 +1,150 @@
+# detection/backends.py
+from __future__ import annotations
+from typing import List, Any, Tuple
+from pathlib import Path
+import os, shutil, hashlib, tempfile, logging
+import numpy as np
+import cv2
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+PAD_VALUE = (114, 114, 114)
+
+# ------------------ weights identity & export cache ------------------
+
+def weights_digest(path: str | os.PathLike, chunk: int = 1 << 20) -> str:
+    """sha256 of the weights file contents (hex)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _cache_dir() -> Path:
+    d = Path(getattr(settings, "YOLO_EXPORT_CACHE_DIR", Path(settings.BASE_DIR) / "weights" / "cache"))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+def export_onnx(weights: str, imgsz: int = 640) -> str:
+    """
+    Export a .pt to ONNX once and cache it as <cache>/<stem>-<sha256[:16]>.onnx.
+    Re-exports only when the weights contents change. Returns the .onnx path.
+    """
+    if str(weights).lower().endswith(".onnx"):
+        return str(weights)
+    src = Path(weights)
+    target = _cache_dir() / f"{src.stem}-{weights_digest(src)[:16]}.onnx"
+    if target.exists():
+        return str(target)
+
+    from ultralytics import YOLO
+    # export from a private copy: Ultralytics writes next to the .pt and workers may race
+    with tempfile.TemporaryDirectory(dir=target.parent) as tmp:
+        tmp_pt = Path(tmp) / src.name
+        shutil.copy2(src, tmp_pt)
+        out = YOLO(str(tmp_pt)).export(format="onnx", imgsz=imgsz, dynamic=True, verbose=False)
+        os.replace(out, target)
+    log.info("Exported %s -> %s", weights, target)
+    return str(target)
+
+# ------------------ ONNX Runtime model ------------------
+
+class _Boxes:
+    """Minimal stand-in for ultralytics Boxes (NumPy arrays, read by _boxes_from_result)."""
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy, self.conf, self.cls = xyxy, conf, cls
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+class _Result:
+    def __init__(self, boxes: _Boxes, orig_shape: Tuple[int, int]):
+        self.boxes = boxes
+        self.orig_shape = orig_shape
+
+def _letterbox(img: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Ultralytics-style letterbox to size x size: returns (padded BGR, ratio, (pad_left, pad_top))."""
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    if (nw, nh) != (w, h):
+        img = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (size - nw) / 2, (size - nh) / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=PAD_VALUE)
+    return img, r, (left, top)
+
+def preprocess(imgs: List[Any], imgsz: int) -> Tuple[np.ndarray, List[Tuple[float, Tuple[int, int], Tuple[int, int]]]]:
+    """BGR ndarrays / PIL images -> (N,3,S,S) float32 RGB blob in [0,1] + (ratio, pad, shape) per image."""
+    size = int(np.ceil(imgsz / 32) * 32)
+    blob = np.empty((len(imgs), 3, size, size), dtype=np.float32)
+    metas = []
+    for i, im in enumerate(imgs):
+        if not isinstance(im, np.ndarray):  # PIL (RGB) input
+            im = cv2.cvtColor(np.asarray(im.convert("RGB")), cv2.COLOR_RGB2BGR)
+        lb, r, pad = _letterbox(im, size)
+        blob[i] = lb[:, :, ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+        metas.append((r, pad, im.shape[:2]))
+    blob *= 1.0 / 255.0
+    return blob, metas
+
+class OnnxYolo:
+    """
+    CPU inference on an exported YOLO ONNX graph with NumPy pre/post-processing.
+    Exposes the subset of ultralytics.YOLO.predict that detector.py uses.
+    """
+    def __init__(self, onnx_path: str, iou: float = 0.7, max_det: int = 300):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("YOLO_BACKEND=onnx requires the 'onnxruntime' package") from e
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        from .cpu import worker_threads
+        threads = int(getattr(settings, "YOLO_ONNX_THREADS", 0)) or worker_threads()
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.path = onnx_path
+        self.iou = iou
+        self.max_det = max_det
+
+    def _postprocess(self, pred: np.ndarray, conf: float, r: float, pad: Tuple[int, int],
+                     shape: Tuple[int, int]) -> _Result:
+        from .detector import _nms_arrays
+        if pred.shape[-1] == 6 and pred.shape[0] <= self.max_det:
+            # end-to-end graphs: (max_det, [x1, y1, x2, y2, score, cls]), already NMS'd
+            pred = pred[pred[:, 4] >= conf]
+            xyxy, scores, cls = pred[:, :4].astype(np.float64), pred[:, 4], pred[:, 5].astype(np.int64)
+        else:
+            pred = pred.T  # (4+nc, N) -> (N, 4+nc): cx, cy, w, h, class scores
+            cls_scores = pred[:, 4:]
+            cls = cls_scores.argmax(axis=1)
+            scores = cls_scores[np.arange(len(cls)), cls]
+            m = scores >= conf
+            pred, cls, scores = pred[m], cls[m], scores[m]
+            cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2] / 2, pred[:, 3] / 2
+            xyxy = np.stack([cx - w, cy - h, cx + w, cy + h], axis=1).astype(np.float64)
+            keep = _nms_arrays(xyxy, scores, cls, iou_th=self.iou)
+            keep = keep[np.argsort(-scores[keep], kind="stable")][: self.max_det]
+            xyxy, scores, cls = xyxy[keep], scores[keep], cls[keep]
+
+        xyxy[:, [0, 2]] -= pad[0]
+        xyxy[:, [1, 3]] -= pad[1]
+        xyxy /= r
+        h0, w0 = shape
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w0)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h0)
+        return _Result(_Boxes(xyxy, scores.astype(np.float64), cls.astype(np.int64)), (h0, w0))
+
+    def predict(self, source: Any, conf: float = 0.25, imgsz: int = 640, device: Any = None,
+                verbose: bool = False, batch: int | None = None, **_) -> List[_Result]:
+        imgs = source if isinstance(source, (list, tuple)) else [source]
+        blob, metas = preprocess(imgs, imgsz)
+        out = self.session.run(None, {self.input_name: blob})[0]
+        return [self._postprocess(out[i], conf, *metas[i]) for i in range(len(imgs))]
+
+    __call__ = predict
@@ -0,0 +1,95 @@
+# detection/cache.py
+from __future__ import annotations
+from typing import Any, Dict, Hashable, Tuple
+from collections import OrderedDict
+import hashlib, threading, time
+from django.conf import settings
+
+
+def content_hash(data: bytes) -> str:
+    """128-bit BLAKE2b of the upload (well over 1 GB/s; cheap next to decode + inference)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def payload_nbytes(res: Dict[str, Any]) -> int:
+    """Rough in-memory size of a run_inference payload: the JPEG string dominates when present."""
+    return 512 + len(res.get("image_b64") or "") + 160 * len(res.get("detections") or ())
+
+
+class ResultCache:
+    """
+    Thread-safe LRU of inference payloads with a byte budget and optional TTL.
+    One per process; each uvicorn / batch worker keeps its own.
+    """
+
+    def __init__(self, max_bytes: int, ttl_s: float = 0.0):
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl_s)
+        self._data: "OrderedDict[Hashable, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key: Hashable) -> Dict[str, Any] | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[0] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, res: Dict[str, Any]) -> None:
+        size = payload_nbytes(res)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic(), size, res)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self.nbytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+_CACHE: ResultCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+def result_cache() -> ResultCache | None:
+    """Process-wide cache sized by settings.YOLO_RESULT_CACHE_MB (0 disables), else None."""
+    global _CACHE
+    mb = float(getattr(settings, "YOLO_RESULT_CACHE_MB", 0))
+    if mb <= 0:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ResultCache(int(mb * (1 << 20)), getattr(settings, "YOLO_RESULT_CACHE_TTL_S", 0))
+    return _CACHE
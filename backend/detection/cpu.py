@@ -0,0 +1,134 @@
+# detection/cpu.py
+from __future__ import annotations
+from typing import Any, Dict, List
+import os, sys, logging
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+# Per-worker CPU budget. uvicorn --workers N starts N processes that each default to one
+# torch/OpenMP thread per core, so N workers run N x cores threads and latency collapses under
+# load. configure_worker() (called from asgi.py / wsgi.py / detection_worker at startup) splits
+# YOLO_CPU_BUDGET cores across YOLO_SERVER_WORKERS and, with YOLO_CPU_AFFINITY on Linux, pins
+# each worker to its own disjoint core set.
+
+_THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+_LAYOUT: Dict[str, Any] | None = None
+_SLOT_FD: int | None = None  # held for the life of the process; the kernel drops the lock on exit
+
+def available_cores() -> List[int]:
+    """Cores this process may run on (honours taskset/cgroup masks where the OS reports them)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def _claim_slot(slots: int) -> int | None:
+    """
+    Worker index 0..slots-1, taken as an exclusive flock on YOLO_CPU_SLOT_DIR/slot-<i>.lock.
+    uvicorn gives its workers no index; a lock file per slot hands out disjoint ones and
+    frees the slot of a worker that dies (and is restarted). None when all are taken.
+    """
+    global _SLOT_FD
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    d = getattr(settings, "YOLO_CPU_SLOT_DIR", os.path.join(settings.BASE_DIR, "run"))
+    os.makedirs(d, exist_ok=True)
+    for i in range(slots):
+        fd = os.open(os.path.join(d, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        _SLOT_FD = fd
+        return i
+    return None
+
+def apply_threads(intra: int, interop: int = 1, cores: List[int] | None = None) -> None:
+    """Pin to `cores` (Linux) and cap torch / OpenMP / OpenCV threads. Settings-free (benchmarks use it)."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    for var in _THREAD_ENV:
+        # read by OpenMP/MKL when torch is first imported
+        os.environ[var] = str(intra)
+    try:
+        import cv2
+        cv2.setNumThreads(intra)
+    except Exception:
+        pass
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(intra)
+    try:
+        torch.set_num_interop_threads(interop)
+    except RuntimeError:
+        # only allowed before the first inter-op parallel work in this process
+        log.warning("torch inter-op threads already fixed at %d", torch.get_num_interop_threads())
+
+def plan_layout(budget: int, workers: int, intra: int = 0, affinity: bool = False,
+                slot: int | None = None) -> Dict[str, Any]:
+    """Threads and (optionally) the core set for worker `slot` of `workers` sharing `budget` cores."""
+    cores = available_cores()
+    budget = min(budget, len(cores)) if budget > 0 else len(cores)
+    workers = max(1, workers)
+    per_worker = max(1, budget // workers)
+    layout: Dict[str, Any] = {
+        "cpu_budget": budget, "workers": workers, "slot": slot,
+        "intra_threads": intra if intra > 0 else per_worker, "cores": None,
+    }
+    if affinity and slot is not None and hasattr(os, "sched_setaffinity"):
+        if budget >= workers:
+            layout["cores"] = cores[:budget][slot * per_worker:(slot + 1) * per_worker]
+        else:
+            # fewer cores than workers: workers share cores round-robin
+            layout["cores"] = [cores[slot % budget]]
+    return layout
+
+def configure_worker() -> Dict[str, Any]:
+    """Apply the settings' CPU layout to this process (once); returns it."""
+    global _LAYOUT
+    if _LAYOUT is not None:
+        return _LAYOUT
+    workers = max(1, int(getattr(settings, "YOLO_SERVER_WORKERS", 1)))
+    affinity = bool(getattr(settings, "YOLO_CPU_AFFINITY", False))
+    slot = _claim_slot(workers) if affinity else None
+    if affinity and slot is None:
+        log.warning("CPU affinity requested but no free worker slot (or no flock); not pinning")
+    layout = plan_layout(
+        int(getattr(settings, "YOLO_CPU_BUDGET", 0)), workers,
+        intra=int(getattr(settings, "YOLO_TORCH_THREADS", 0)), affinity=affinity, slot=slot,
+    )
+    layout["interop_threads"] = max(1, int(getattr(settings, "YOLO_TORCH_INTEROP_THREADS", 1)))
+    apply_threads(layout["intra_threads"], layout["interop_threads"], layout["cores"])
+    _LAYOUT = layout
+    log.info("CPU layout pid=%d slot=%s intra=%d interop=%d cores=%s (budget %d / %d workers)",
+             os.getpid(), slot, layout["intra_threads"], layout["interop_threads"], layout["cores"],
+             layout["cpu_budget"], workers)
+    return layout
+
+def worker_threads() -> int:
+    """This worker's intra-op thread budget; 0 when configure_worker() has not run (library defaults)."""
+    return _LAYOUT["intra_threads"] if _LAYOUT else 0
+
+def diagnostics() -> Dict[str, Any]:
+    """Configured layout plus what the runtimes actually report, and the torch warm-up report (GET /api/runtime/)."""
+    out: Dict[str, Any] = {"pid": os.getpid(), "cpu_count": os.cpu_count(), "configured": _LAYOUT is not None,
+                           "layout": _LAYOUT, "affinity": available_cores(),
+                           "env": {k: os.environ.get(k) for k in _THREAD_ENV}}
+    try:
+        import cv2
+        out["opencv_threads"] = cv2.getNumThreads()
+    except Exception:
+        pass
+    torch = sys.modules.get("torch")  # don't import torch just to report on it
+    if torch is not None:
+        out["torch_threads"] = torch.get_num_threads()
+        out["torch_interop_threads"] = torch.get_num_interop_threads()
+    torchopt = sys.modules.get("detection.torchopt")
+    if torchopt is not None:
+        out["torch_optimize"] = torchopt.report()
+    return out
@@ -1,12 +1,21 @@
 # detection/detector.py
 from __future__ import annotations
 from typing import List, Dict, Any, Tuple
-import time, base64, io, logging
+import os, time, base64, io, logging, threading
 import numpy as np
 import cv2
 from PIL import Image, ImageOps
 from django.conf import settings
 
+from .tiling import plan_tiles, pad_tile, screen_tiles, SCREEN_OFF
+from .scheduler import get_scheduler
+from .cache import result_cache, content_hash
+from .rawstore import save_raw, load_raw
+from .artifacts import encode_image, save_artifact, artifact_path, artifact_url
+from .timing import StageTimer, NULL_TIMER
+from .metrics import in_flight, observe_image, model_loaded
+from .pool import ModelPool, leased
+
 log = logging.getLogger(__name__)
 
 # COLORS: BGR (OpenCV)
@@ -18,35 +27,137 @@ COLORS = {
 
 # ------------------ model/device helpers ------------------
 
-_MODEL = None
+_MODEL: ModelPool | None = None   # replicas of the loaded weights (see pool.py)
 _MODEL_WEIGHTS = None
+_MODEL_BACKEND = None
+_MODEL_ID = None
+_MODEL_LOCK = threading.Lock()
 
-def _load_model():
+def _configured_weights() -> str | None:
+    """Active YoloModel.weights_path if one is registered, else settings.YOLO_MODEL_PATH."""
+    try:
+        from .models import YoloModel
+        m = YoloModel.objects.filter(is_active=True).only("weights_path").first()
+        if m and m.weights_path:
+            return m.weights_path
+    except Exception:
+        # DB not migrated / not reachable: fall back to settings
+        log.debug("No active YoloModel available; using YOLO_MODEL_PATH", exc_info=True)
+    return getattr(settings, "YOLO_MODEL_PATH", None)
+
+def _configured_int8() -> str | None:
+    """INT8 .onnx of the active YoloModel when it is selected for serving (serve_int8) and present."""
+    if not getattr(settings, "YOLO_SERVE_INT8", True):
+        return None
+    try:
+        from .models import YoloModel
+        m = YoloModel.objects.filter(is_active=True, serve_int8=True).only("int8_path").first()
+    except Exception:
+        log.debug("No active YoloModel available; not serving INT8", exc_info=True)
+        return None
+    if m and m.int8_path:
+        if os.path.isfile(m.int8_path):
+            return m.int8_path
+        log.warning("INT8 variant %s is missing; serving the FP32 weights", m.int8_path)
+    return None
+
+def _new_replica(weights: str, backend: str, int8: str | None) -> Tuple[Any, str, str]:
+    """One model instance: (model, weights actually loaded, backend label)."""
+    if int8:
+        from .backends import OnnxYolo
+        return OnnxYolo(int8), int8, "onnx-int8"
+    if backend == "onnx":
+        from .backends import OnnxYolo, export_onnx
+        return OnnxYolo(export_onnx(weights)), weights, backend
+    if backend == "torch":
+        from ultralytics import YOLO
+        model = YOLO(weights)
+        if getattr(settings, "YOLO_TORCH_OPTIMIZE", False):
+            dev = _resolve_device(getattr(settings, "DEFAULT_YOLO_DEVICE", "cpu"))
+            if dev == "cpu":
+                from .torchopt import optimize
+                rep = optimize(model, dev)
+                # bf16 changes the numbers: keep optimized results apart in the result cache
+                backend = "torch-opt-bf16" if rep["bf16"] else "torch-opt"
+            else:
+                log.info("YOLO_TORCH_OPTIMIZE is CPU-only; skipped on device %s", dev)
+        return model, weights, backend
+    raise RuntimeError(f"Unknown YOLO_BACKEND {backend!r} (expected 'torch' or 'onnx')")
+
+def _load_model() -> ModelPool:
     """
-    Lazy-load and cache a single YOLO model instance.
-    Uses settings.YOLO_MODEL_PATH (must point to your trained .pt).
+    Lazy-load and cache the model pool: YOLO_MODEL_POOL_SIZE replicas of the same weights, each
+    used by one forward pass at a time (checkout/checkin, see pool.py). Loads are serialized, so
+    concurrent first requests load once.
+    Weights: the active YoloModel, else settings.YOLO_MODEL_PATH (must point to your trained .pt).
+    settings.YOLO_BACKEND selects 'torch' (Ultralytics) or 'onnx' (ONNX Runtime, CPU; the .pt
+    is exported once and cached on disk by content hash). An active model with serve_int8 set
+    runs its quantized ONNX graph instead (backend 'onnx-int8').
     """
-    global _MODEL, _MODEL_WEIGHTS
+    global _MODEL, _MODEL_WEIGHTS, _MODEL_BACKEND, _MODEL_ID
     if _MODEL is not None:
         return _MODEL
-
-    weights = getattr(settings, "YOLO_MODEL_PATH", None)
-    if not weights:
-        # Give a precise error so the view can surface it when DEBUG=True
-        raise RuntimeError(
-            "YOLO_MODEL_PATH is not configured in settings. "
-            "Set it to the path of your trained weights (e.g., '/path/to/best.pt')."
-        )
-
+    with _MODEL_LOCK:
+        if _MODEL is not None:
+            return _MODEL
+
+        weights = _configured_weights()
+        if not weights:
+            # Give a precise error so the view can surface it when DEBUG=True
+            raise RuntimeError(
+                "YOLO_MODEL_PATH is not configured in settings. "
+                "Set it to the path of your trained weights (e.g., '/path/to/best.pt')."
+            )
+
+        backend = str(getattr(settings, "YOLO_BACKEND", "torch")).lower()
+        int8 = _configured_int8()
+        size = max(1, int(getattr(settings, "YOLO_MODEL_POOL_SIZE", 1)))
+        t0 = time.perf_counter()
+        try:
+            replicas = []
+            for _ in range(size):
+                model, loaded, label = _new_replica(weights, backend, int8)
+                replicas.append(model)
+            _MODEL_WEIGHTS = loaded
+            _MODEL_BACKEND = label
+            _MODEL_ID = None
+            model_loaded(loaded, label, time.perf_counter() - t0)
+            log.info("Loaded YOLO weights: %s (backend=%s, %d replica%s)", loaded, label, size, "" if size == 1 else "s")
+            _MODEL = ModelPool(replicas, timeout_s=float(getattr(settings, "YOLO_MODEL_POOL_TIMEOUT_S", 30)))
+            return _MODEL
+        except Exception as e:
+            log.exception("Failed to load YOLO weights from %s", weights)
+            raise
+
+def warm_start() -> None:
+    """
+    Worker startup: with YOLO_WARMUP, load (and warm up) the model now instead of on the first
+    request; with YOLO_BATCH_PROCESSES, also fork the batch workers now, before any request thread.
+    """
+    procs = int(getattr(settings, "YOLO_BATCH_PROCESSES", 0)) > 0
+    if not (getattr(settings, "YOLO_WARMUP", False) or procs):
+        return
     try:
-        from ultralytics import YOLO
-        _MODEL = YOLO(weights)
-        _MODEL_WEIGHTS = weights
-        log.info("Loaded YOLO weights: %s", weights)
-        return _MODEL
-    except Exception as e:
-        log.exception("Failed to load YOLO weights from %s", weights)
-        raise
+        _load_model()
+    except Exception:
+        return  # logged by _load_model; requests retry the load and report the error
+    if procs:
+        from .executors import start_batch_pool
+        try:
+            start_batch_pool()
+        except Exception:
+            log.exception("Could not start batch workers; they will be started on first use")
+
+def _model_identity() -> str:
+    """Backend + weights path + size/mtime of the loaded weights (part of the result-cache key)."""
+    global _MODEL_ID
+    if _MODEL_ID is None:
+        try:
+            st = os.stat(_MODEL_WEIGHTS)
+            _MODEL_ID = f"{_MODEL_BACKEND}:{_MODEL_WEIGHTS}:{st.st_size}:{st.st_mtime_ns}"
+        except (OSError, TypeError):
+            _MODEL_ID = f"{_MODEL_BACKEND}:{_MODEL_WEIGHTS}"
+    return _MODEL_ID
 
 def _resolve_device(device: str | None) -> str:
     """
@@ -94,26 +205,147 @@ def _iou_xyxy(a: Tuple[float,float,float,float], b: Tuple[float,float,float,floa
     denom = area_a + area_b - inter
     return inter / denom if denom > 0 else 0.0
 
+def _nms_arrays(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou_th: float = 0.5) -> np.ndarray:
+    """
+    Vectorized class-wise greedy NMS on contiguous arrays.
+      boxes: (N,4) x1,y1,x2,y2   scores: (N,)   classes: (N,) any hashable dtype
+    Returns kept indices grouped by class (first-appearance order), each group by
+    descending score -- the same keep set and order as the dict-based loop.
+    """
+    boxes = np.ascontiguousarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.ascontiguousarray(scores, dtype=np.float64).reshape(-1)
+    classes = np.asarray(classes).reshape(-1)
+    if scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # class group ids ranked by first appearance, then stable sort by (group, -score)
+    _, first, inv = np.unique(classes, return_index=True, return_inverse=True)
+    rank = np.empty_like(first)
+    rank[np.argsort(first)] = np.arange(first.size)
+    grp = rank[inv.reshape(-1)]
+    order = np.lexsort((-scores, grp))
+    bounds = np.flatnonzero(np.diff(grp[order])) + 1
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(0.0, x2 - x1) * np.maximum(0.0, y2 - y1)
+
+    keep: List[int] = []
+    for idxs in np.split(order, bounds):
+        while idxs.size:
+            i = idxs[0]
+            keep.append(i)
+            rest = idxs[1:]
+            if rest.size == 0:
+                break
+            iw = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+            ih = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+            inter = iw * ih
+            denom = areas[i] + areas[rest] - inter
+            iou = np.zeros_like(inter)
+            np.divide(inter, denom, out=iou, where=(inter > 0) & (denom > 0))
+            idxs = rest[iou < iou_th]
+    return np.asarray(keep, dtype=np.intp)
+
+# above this many boxes _nms_classwise switches to the grid-indexed merge
+GRID_NMS_MIN_BOXES = 1024
+
+def _nms_grid(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou_th: float = 0.5,
+              cell: float | None = None) -> np.ndarray:
+    """
+    Same keep set and order as _nms_arrays, but only boxes of one class that share a cell of a
+    uniform spatial grid are compared (boxes in no common cell cannot overlap). Cost is roughly
+    linear in boxes + overlapping pairs, instead of quadratic per class.
+      cell: grid pitch in pixels; default ~2x the median box side.
+    """
+    boxes = np.ascontiguousarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.ascontiguousarray(scores, dtype=np.float64).reshape(-1)
+    classes = np.asarray(classes).reshape(-1)
+    n = scores.size
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+    if iou_th <= 0:
+        # every same-class pair suppresses, overlapping or not
+        return _nms_arrays(boxes, scores, classes, iou_th=iou_th)
+
+    # rank = position in (class first appearance, -score) order, as in _nms_arrays
+    _, first, inv = np.unique(classes, return_index=True, return_inverse=True)
+    crank = np.empty_like(first)
+    crank[np.argsort(first)] = np.arange(first.size)
+    grp = crank[inv.reshape(-1)]
+    order = np.lexsort((-scores, grp))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(0.0, x2 - x1) * np.maximum(0.0, y2 - y1)
+    if cell is None:
+        side = np.maximum(x2 - x1, y2 - y1)
+        cell = 2.0 * float(np.median(side[side > 0])) if np.any(side > 0) else 1.0
+    cell = max(float(cell), 1.0)
+
+    # box -> every grid cell it touches
+    ox, oy = float(x1.min()), float(y1.min())
+    cx0 = np.floor((x1 - ox) / cell).astype(np.int64)
+    cy0 = np.floor((y1 - oy) / cell).astype(np.int64)
+    cx1 = np.maximum(cx0, np.floor((x2 - ox) / cell).astype(np.int64))
+    cy1 = np.maximum(cy0, np.floor((y2 - oy) / cell).astype(np.int64))
+    nx, ny = cx1 - cx0 + 1, cy1 - cy0 + 1
+    per_box = nx * ny
+    box_id = np.repeat(np.arange(n), per_box)
+    j = np.arange(box_id.size) - np.repeat(np.cumsum(per_box) - per_box, per_box)
+    gx = int(cx1.max()) + 1
+    gy = int(cy1.max()) + 1
+    key = (grp[box_id] * gy + cy0[box_id] + j // nx[box_id]) * gx + cx0[box_id] + j % nx[box_id]
+
+    # all pairs within each (class, cell) bucket
+    srt = np.argsort(key, kind="stable")
+    key, box_id = key[srt], box_id[srt]
+    bucket_end = np.r_[np.flatnonzero(np.diff(key)) + 1, key.size]
+    ends = np.repeat(bucket_end, np.diff(np.r_[0, bucket_end]))
+    cnt = ends - np.arange(key.size) - 1
+    left = np.repeat(np.arange(key.size), cnt)
+    right = left + np.arange(left.size) - np.repeat(np.cumsum(cnt) - cnt, cnt) + 1
+    a, b = box_id[left], box_id[right]
+    swap = rank[a] > rank[b]  # orient: a outranks b
+    a, b = np.where(swap, b, a), np.where(swap, a, b)
+    pair = np.unique(a * n + b)
+    a, b = pair // n, pair % n
+
+    iw = np.maximum(0.0, np.minimum(x2[a], x2[b]) - np.maximum(x1[a], x1[b]))
+    ih = np.maximum(0.0, np.minimum(y2[a], y2[b]) - np.maximum(y1[a], y1[b]))
+    inter = iw * ih
+    denom = areas[a] + areas[b] - inter
+    iou = np.zeros_like(inter)
+    np.divide(inter, denom, out=iou, where=(inter > 0) & (denom > 0))
+    hit = iou >= iou_th
+    a, b = a[hit], b[hit]
+
+    # greedy pass over boxes that can suppress something, best rank first
+    suppressed = np.zeros(n, dtype=bool)
+    if a.size:
+        by = np.argsort(rank[a], kind="stable")
+        a, b = a[by], b[by]
+        starts = np.r_[0, np.flatnonzero(np.diff(a)) + 1]
+        stops = np.r_[starts[1:], a.size]
+        for s0, s1 in zip(starts.tolist(), stops.tolist()):
+            if not suppressed[a[s0]]:
+                suppressed[b[s0:s1]] = True
+    return order[~suppressed[order]].astype(np.intp)
+
 def _nms_classwise(dets: List[Dict[str, Any]], iou_th: float = 0.5) -> List[Dict[str, Any]]:
     """NMS per class on global boxes (expects det['bbox'] as x1,y1,x2,y2)."""
-    out: List[Dict[str, Any]] = []
-    by_cls: Dict[str, List[int]] = {}
-    for i, d in enumerate(dets):
-        by_cls.setdefault(d["class_name"], []).append(i)
-    for _, idxs in by_cls.items():
-        idxs = sorted(idxs, key=lambda i: dets[i]["confidence"], reverse=True)
-        keep: List[int] = []
-        while idxs:
-            i = idxs.pop(0)
-            keep.append(i)
-            xi = dets[i]["bbox"]
-            idxs = [j for j in idxs if _iou_xyxy(xi, dets[j]["bbox"]) < iou_th]
-        out.extend(dets[k] for k in keep)
-    return out
+    if not dets:
+        return []
+    boxes = np.array([d["bbox"] for d in dets], dtype=np.float64)
+    scores = np.array([d["confidence"] for d in dets], dtype=np.float64)
+    classes = np.array([d["class_name"] for d in dets])
+    nms = _nms_grid if len(dets) > GRID_NMS_MIN_BOXES else _nms_arrays
+    keep = nms(boxes, scores, classes, iou_th=iou_th)
+    return [dets[k] for k in keep.tolist()]
 
 # ------------------ IO & model calls ------------------
 
-def _pil_from_file(file_obj) -> Image.Image:
+def _read_bytes(file_obj) -> bytes:
     if hasattr(file_obj, "read"):
         pos = file_obj.tell() if hasattr(file_obj, "tell") else None
         try:
@@ -126,9 +358,11 @@ def _pil_from_file(file_obj) -> Image.Image:
                 file_obj.seek(pos)
             except Exception:
                 pass
-    else:
-        data = file_obj
+        return data
+    return file_obj
 
+def _pil_from_file(file_obj) -> Image.Image:
+    data = _read_bytes(file_obj)
     img = Image.open(io.BytesIO(data))
     try:
         img = ImageOps.exif_transpose(img)
@@ -136,11 +370,35 @@ def _pil_from_file(file_obj) -> Image.Image:
         pass
     return img.convert("RGB")
 
-def _predict_on_pil(model, pil_img: Image.Image, conf: float, imgsz: int, device: str):
-    # Ultralytics accepts PIL directly
-    results = model.predict(source=pil_img, conf=conf, imgsz=imgsz, device=device, verbose=False)
+def _bgr_from_file(file_obj) -> np.ndarray:
+    """
+    Decode once into a single contiguous HxWx3 uint8 BGR buffer (EXIF orientation applied).
+    Tiles are taken as views of this buffer and annotation draws on it in place.
+    """
+    data = _read_bytes(file_obj)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    img = cv2.imdecode(buf, cv2.IMREAD_COLOR) if buf.size else None
+    if img is None:
+        # formats/codecs OpenCV can't decode: PIL, then swap channels in place
+        img = np.array(_pil_from_file(data))
+        cv2.cvtColor(img, cv2.COLOR_RGB2BGR, dst=img)
+    return np.ascontiguousarray(img)
+
+def _predict_on_image(model, img: np.ndarray, conf: float, imgsz: int, device: str):
+    # Ultralytics takes HxWx3 BGR ndarrays (and strided views of them) directly
+    with leased(model) as m:
+        results = m.predict(source=img, conf=conf, imgsz=imgsz, device=device, verbose=False)
     return results[0]
 
+def _predict_batch(model, imgs: List[Any], conf: float, imgsz: int, device: str) -> List[Any]:
+    """One forward pass over a list of images; returns one result per input, in order."""
+    if not imgs:
+        return []
+    with leased(model) as m:
+        results = m.predict(source=list(imgs), conf=conf, imgsz=imgsz, device=device,
+                            batch=len(imgs), verbose=False)
+    return list(results)
+
 def _boxes_from_result(r) -> List[Dict[str, Any]]:
     boxes = getattr(r, "boxes", None)
     dets: List[Dict[str, Any]] = []
@@ -168,6 +426,228 @@ def _draw_rects_bgr(img_bgr: np.ndarray, dets: List[Dict[str, Any]], thickness:
         cv2.rectangle(img_bgr, (xi1, yi1), (xi2, yi2), color, thickness, lineType=cv2.LINE_AA)
     return img_bgr
 
+# ------------------ stages ------------------
+
+# each screen method's threshold has its own unit, so its own setting
+_SCREEN_THRESHOLD_SETTINGS = {"std": "YOLO_TILE_SCREEN_STD_THRESHOLD", "edges": "YOLO_TILE_SCREEN_EDGE_FRACTION"}
+
+def _use_tiling(tile: str | int | bool, W: int, H: int, tile_size: int) -> bool:
+    if isinstance(tile, str):
+        t = tile.lower()
+        return (t in ("auto", "coarse") and max(W, H) > tile_size) or (t in ("1", "true", "yes"))
+    return bool(tile)
+
+def _coarse_rois(dets: List[Dict[str, Any]], W: int, H: int, margin: float) -> np.ndarray:
+    """Global-pass boxes grown by `margin` x their size on each side (objects cluster), clipped."""
+    if not dets:
+        return np.zeros((0, 4))
+    b = np.array([d["bbox"] for d in dets], dtype=np.float64)
+    grow = margin * np.maximum(b[:, 2] - b[:, 0], b[:, 3] - b[:, 1])[:, None]
+    b[:, :2] -= grow
+    b[:, 2:] += grow
+    return np.clip(b, 0, [W, H, W, H])
+
+def _tiles_touching(tiles, rois: np.ndarray) -> List[bool]:
+    if not len(rois):
+        return [False] * len(tiles)
+    t = np.asarray(tiles, dtype=np.float64)[:, None, :]
+    r = rois[None, :, :]
+    hit = (t[..., 0] < r[..., 2]) & (t[..., 2] > r[..., 0]) & (t[..., 1] < r[..., 3]) & (t[..., 3] > r[..., 1])
+    return hit.any(axis=1).tolist()
+
+def _detect(
+    model, img: np.ndarray, conf: float, imgsz: int, dev: str,
+    tile: str | int | bool = "auto", tile_size: int = 640, overlap: float = 0.20,
+    nms_iou: float = 0.50, tile_batch: int | None = None, pad_tiles: bool | None = None,
+    screen: str | None = None, timer: StageTimer = NULL_TIMER,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Model stage on a decoded BGR image: single-pass or tiled inference + class-wise NMS.
+    Returns (detections in global x1,y1,x2,y2, extra payload keys).
+    """
+    raw, extra = _detect_raw(model, img, conf=conf, imgsz=imgsz, dev=dev, tile=tile, tile_size=tile_size,
+                             overlap=overlap, tile_batch=tile_batch, pad_tiles=pad_tiles, screen=screen,
+                             timer=timer)
+    with timer.stage("nms"):
+        return _nms_classwise(raw, iou_th=nms_iou), extra
+
+def _detect_raw(
+    model, img: np.ndarray, conf: float, imgsz: int, dev: str,
+    tile: str | int | bool = "auto", tile_size: int = 640, overlap: float = 0.20,
+    tile_batch: int | None = None, pad_tiles: bool | None = None, screen: str | None = None,
+    timer: StageTimer = NULL_TIMER,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    _detect without our class-wise NMS: (all model detections in global coords, extra).
+    screen ('std' | 'edges', default settings.YOLO_TILE_SCREEN) skips tiles that a cheap
+    downsampled variance / edge-density check finds empty; reported as tiling.skipped.
+    tile='coarse' first runs one downscaled whole-image pass and only tiles around what it
+    found (tiling.coarse_skipped); its detections are merged with the tiles'.
+    """
+    H, W = img.shape[:2]
+    sched = get_scheduler(model)  # cross-request micro-batching (None = call the model directly)
+
+    if not _use_tiling(tile, W, H, tile_size):
+        # ----- Simple single-pass inference -----
+        with timer.forward():
+            if sched is not None:
+                r = sched.predict([img], conf=conf, imgsz=imgsz, device=dev)[0]
+            else:
+                r = _predict_on_image(model, img, conf=conf, imgsz=imgsz, device=dev)
+        with timer.stage("boxes"):
+            return _boxes_from_result(r), {}
+
+    # ----- Tiled inference -----
+    t_tiling = time.perf_counter()
+    plan = plan_tiles(W, H, tile_size, overlap, getattr(settings, "YOLO_TILE_ALIGN_EDGES", True))
+    if pad_tiles is None:
+        pad_tiles = getattr(settings, "YOLO_TILE_PAD", False)
+    if tile_batch is None:
+        tile_batch = getattr(settings, "YOLO_TILE_BATCH", 1)
+    tile_batch = max(1, int(tile_batch))
+    tiles = plan.tiles
+    timer.add("tiling", time.perf_counter() - t_tiling)
+    coarse_dets: List[Dict[str, Any]] | None = None
+    if str(tile).lower() == "coarse":
+        # ----- coarse pass: whole image at imgsz, low conf, picks the tiles worth running -----
+        coarse_conf = min(conf, float(getattr(settings, "YOLO_COARSE_CONF", 0.10)))
+        with timer.forward():
+            if sched is not None:
+                r = sched.predict([img], conf=coarse_conf, imgsz=imgsz, device=dev)[0]
+            else:
+                r = _predict_on_image(model, img, conf=coarse_conf, imgsz=imgsz, device=dev)
+        with timer.stage("boxes"):
+            coarse_dets = _boxes_from_result(r)
+        with timer.stage("tiling"):
+            rois = _coarse_rois(coarse_dets, W, H, float(getattr(settings, "YOLO_COARSE_MARGIN", 0.5)))
+            tiles = [t for t, k in zip(tiles, _tiles_touching(tiles, rois)) if k]
+    coarse_skipped = len(plan.tiles) - len(tiles)
+    if screen is None:
+        screen = getattr(settings, "YOLO_TILE_SCREEN", "")
+    screen = str(screen or "").lower()
+    if screen not in SCREEN_OFF:
+        with timer.stage("screen"):
+            setting = _SCREEN_THRESHOLD_SETTINGS.get(screen)
+            threshold = getattr(settings, setting, None) if setting else None  # None: tiling's default
+            keep = screen_tiles(img, tiles, screen, threshold, getattr(settings, "YOLO_TILE_SCREEN_SCALE", 8))
+            tiles = [t for t, k in zip(tiles, keep.tolist()) if k]
+    if sched is not None:
+        tile_batch = max(1, len(tiles))  # hand every tile to the scheduler; it forms the batches
+    all_dets: List[Dict[str, Any]] = []
+    pending: List[Tuple[np.ndarray, int, int]] = []  # (tile view, left, top)
+
+    def _flush():
+        with timer.forward():
+            if sched is not None:
+                results = sched.predict([c for c, _, _ in pending], conf=conf, imgsz=imgsz, device=dev)
+            elif tile_batch == 1:
+                results = [_predict_on_image(model, pending[0][0], conf=conf, imgsz=imgsz, device=dev)]
+            else:
+                results = _predict_batch(model, [c for c, _, _ in pending], conf=conf, imgsz=imgsz, device=dev)
+        with timer.stage("boxes"):
+            for (_, left, top), r in zip(pending, results):
+                # translate to global coords (clipped: padded tiles can predict into the border)
+                for d in _boxes_from_result(r):
+                    x1, y1, x2, y2 = d["bbox"]
+                    d["bbox"] = (x1 + left, y1 + top, min(x2 + left, W), min(y2 + top, H))
+                    all_dets.append(d)
+        pending.clear()
+
+    for left, top, right, bottom in tiles:
+        t = time.perf_counter()
+        view = img[top:bottom, left:right]  # strided view, no copy
+        pending.append((pad_tile(view, tile_size) if pad_tiles else view, left, top))
+        timer.add("tiling", time.perf_counter() - t)
+        if len(pending) >= tile_batch:
+            _flush()
+    if pending:
+        _flush()
+
+    skipped = len(plan.tiles) - coarse_skipped - len(tiles)
+    tiling = {"tiles": len(plan.tiles), "grid_tiles": plan.grid_tiles, "saved": plan.saved, "skipped": skipped}
+    if coarse_dets is not None:
+        # full-resolution tiles actually run vs the full plan; the global pass's own boxes join the merge
+        all_dets.extend(d for d in coarse_dets if d["confidence"] >= conf)
+        tiling.update({"mode": "coarse", "coarse_detections": len(coarse_dets),
+                       "coarse_skipped": coarse_skipped, "tiles_run": len(tiles)})
+    log.debug("Tiled %dx%d into %d tiles (%d saved vs plain grid, %d skipped as empty, %d by coarse pass)",
+              W, H, len(plan.tiles), plan.saved, skipped, coarse_skipped)
+    return all_dets, {"tiling": tiling}
+
+def _package(dets: List[Dict[str, Any]], W: int, H: int, t_ms: int,
+             annotated_bgr: np.ndarray | None = None, extra: Dict[str, Any] | None = None,
+             image_format: str = "jpeg", image_url: bool = False, max_dim: int = 0,
+             timer: StageTimer = NULL_TIMER) -> Dict[str, Any]:
+    # build counts + width/height + expand bbox dict format
+    t_pkg = time.perf_counter()
+    counts: Dict[str, int] = {}
+    out_dets: List[Dict[str, Any]] = []
+    for d in dets:
+        x1, y1, x2, y2 = d["bbox"]
+        out_dets.append({
+            "class_name": d["class_name"],
+            "confidence": d["confidence"],
+            "bbox": {
+                "x1": x1, "y1": y1, "x2": x2, "y2": y2,
+                "width": x2 - x1, "height": y2 - y1
+            }
+        })
+        counts[d["class_name"]] = counts.get(d["class_name"], 0) + 1
+
+    payload: Dict[str, Any] = {
+        "image": {"width": W, "height": H},
+        "inference_ms": t_ms,
+        "detections": out_dets,
+        "counts": counts,
+        "total": sum(counts.values()),
+    }
+    if extra:
+        payload.update(extra)
+    timer.add("package", time.perf_counter() - t_pkg)
+
+    if annotated_bgr is not None:
+        try:
+            with timer.stage("encode"):
+                data = encode_image(annotated_bgr, image_format, max_dim)
+        except RuntimeError:
+            log.warning("Annotated image encoding failed", exc_info=True)
+        else:
+            if image_url:
+                # binary artifact fetched separately: no base64 / JSON escaping of the image
+                payload["image_url"] = artifact_url(save_artifact(data, image_format))
+            else:
+                payload["image_b64"] = base64.b64encode(data).decode("ascii")
+    return payload
+
+def _cache_key(data: bytes, conf=0.25, imgsz=640, annotate=False, tile="auto", tile_size=640,
+               overlap=0.20, nms_iou=0.50, pad_tiles=None, image_format="jpeg", image_url=False,
+               max_dim=0, screen=None, **_) -> Tuple:
+    # device and tile_batch only change speed, not results
+    render = (image_format, bool(image_url), int(max_dim or 0)) if annotate else None
+    return (content_hash(data), _model_identity(), float(conf), int(imgsz), bool(annotate),
+            str(tile).lower(), int(tile_size), float(overlap), float(nms_iou), pad_tiles, render,
+            str(screen).lower() if screen is not None else None)
+
+def _cache_get(cache, key) -> Dict[str, Any] | None:
+    hit = cache.get(key)
+    if hit is not None and "image_url" in hit and artifact_path(hit["image_url"].rsplit("/", 1)[-1]) is None:
+        return None  # its annotated image has expired; recompute
+    return hit
+
+def _tiles_inferred(extra: Dict[str, Any] | None) -> int:
+    tiling = (extra or {}).get("tiling")
+    if not tiling:
+        return 1
+    return tiling["tiles"] - tiling.get("skipped", 0) - tiling.get("coarse_skipped", 0)
+
+def _cached(res: Dict[str, Any], t0: float) -> Dict[str, Any]:
+    # inference_ms is this request's time (read + lookup), not the stored run's
+    return {**res, "cached": True, "inference_ms": int((time.perf_counter() - t0) * 1000)}
+
+def _with_timings(res: Dict[str, Any], stage_ms: Dict[str, Any], include: bool) -> Dict[str, Any]:
+    # a copy: the cached payload must not carry one request's timings
+    return {**res, "timings": stage_ms} if include else res
+
 # ------------------ main API ------------------
 
 def run_inference(
@@ -180,96 +660,95 @@ def run_inference(
     tile_size: int = 640,
     overlap: float = 0.20,             # 20% overlap
     nms_iou: float = 0.50,
+    tile_batch: int | None = None,     # tiles per forward pass (1 = one predict call per tile)
+    pad_tiles: bool | None = None,     # pad short edge tiles to tile_size x tile_size
+    keep_raw: bool = False,            # store pre-NMS detections for rethreshold()
+    image_format: str = "jpeg",        # annotated image: "jpeg" | "webp"
+    image_url: bool = False,           # annotated image as an artifact URL instead of base64
+    max_dim: int = 0,                  # downscale the annotated image to this longer side (0 = full)
+    timings: bool = False,             # add the per-stage breakdown to the payload
+    screen: str | None = None,         # empty-tile pre-screen: "std" | "edges" | "off" (None = settings)
 ) -> Dict[str, Any]:
     """
     Tiled inference for large images. Returns:
-      image: {width,height}, detections, counts, total, inference_ms, image_b64 (if annotate)
+      image: {width,height}, detections, counts, total, inference_ms,
+      image_b64 or image_url (if annotate), timings (if requested)
+    With keep_raw the model runs at min(conf, YOLO_RAW_FLOOR_CONF), the raw detections are stored
+    and the payload gets a result_token for rethreshold().
+    Stage timings are always logged on the "detection.timing" logger (INFO).
     """
     # Load model & device
     model = _load_model()
     dev = _resolve_device(device)
-
-    # Read image
-    pil = _pil_from_file(file_obj)
-    W, H = pil.size
-
-    def _package(dets: List[Dict[str, Any]], t_ms: int, annotated_bgr: np.ndarray | None):
-        # build counts + width/height + expand bbox dict format
-        counts: Dict[str, int] = {}
-        out_dets: List[Dict[str, Any]] = []
-        for d in dets:
-            x1, y1, x2, y2 = d["bbox"]
-            out_dets.append({
-                "class_name": d["class_name"],
-                "confidence": d["confidence"],
-                "bbox": {
-                    "x1": x1, "y1": y1, "x2": x2, "y2": y2,
-                    "width": x2 - x1, "height": y2 - y1
-                }
-            })
-            counts[d["class_name"]] = counts.get(d["class_name"], 0) + 1
-
-        payload: Dict[str, Any] = {
-            "image": {"width": W, "height": H},
-            "inference_ms": t_ms,
-            "detections": out_dets,
-            "counts": counts,
-            "total": sum(counts.values()),
-        }
-
-        if annotate and annotated_bgr is not None:
-            ok, buf = cv2.imencode(".jpg", annotated_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
-            if ok:
-                payload["image_b64"] = base64.b64encode(buf.tobytes()).decode("ascii")
-        return payload
-
-    # Decide tiling
-    if isinstance(tile, str):
-        t = tile.lower()
-        tile_flag = (t == "auto" and max(W, H) > tile_size) or (t in ("1", "true", "yes"))
-    else:
-        tile_flag = bool(tile)
-
-    t0 = time.time()
-
-    if not tile_flag:
-        # ----- Simple single-pass inference -----
-        r = _predict_on_pil(model, pil, conf=conf, imgsz=imgsz, device=dev)
-        dets = _boxes_from_result(r)
-        dets = _nms_classwise(dets, iou_th=nms_iou)
+    timer = StageTimer()
+
+    # Identical upload + model + params: serve the stored payload
+    with timer.stage("read"):
+        data = _read_bytes(file_obj)
+    cache, key = (None if keep_raw else result_cache()), None
+    if cache is not None:
+        with timer.stage("cache"):
+            key = _cache_key(data, conf, imgsz, annotate, tile, tile_size, overlap, nms_iou, pad_tiles,
+                             image_format, image_url, max_dim, screen)
+            hit = _cache_get(cache, key)
+        if hit is not None:
+            return _with_timings(_cached(hit, timer.t0), timer.log("cache hit"), timings)
+
+    with in_flight():
+        # Decode once (BGR, contiguous; EXIF orientation applied)
+        with timer.stage("decode"):
+            img = _bgr_from_file(data)
+        del data
+        H, W = img.shape[:2]
+
+        t0 = time.perf_counter()
+        token = None
+        if keep_raw:
+            floor = min(float(conf), float(getattr(settings, "YOLO_RAW_FLOOR_CONF", 0.05)))
+            raw, extra = _detect_raw(model, img, conf=floor, imgsz=imgsz, dev=dev, tile=tile, tile_size=tile_size,
+                                     overlap=overlap, tile_batch=tile_batch, pad_tiles=pad_tiles, screen=screen,
+                                     timer=timer)
+            token = save_raw(raw, W, H, floor, extra)
+            with timer.stage("nms"):
+                dets = _nms_classwise([d for d in raw if d["confidence"] >= conf], iou_th=nms_iou)
+        else:
+            dets, extra = _detect(model, img, conf=conf, imgsz=imgsz, dev=dev, tile=tile, tile_size=tile_size,
+                                  overlap=overlap, nms_iou=nms_iou, tile_batch=tile_batch, pad_tiles=pad_tiles,
+                                  screen=screen, timer=timer)
         annotated = None
         if annotate:
-            bgr = cv2.cvtColor(np.array(pil), cv2.COLOR_RGB2BGR)
-            annotated = _draw_rects_bgr(bgr, dets)
-        t1 = time.time()
-        return _package(dets, int((t1 - t0) * 1000), annotated)
-
-    # ----- Tiled inference -----
-    step = max(1, int(tile_size * (1.0 - overlap)))
-    all_dets: List[Dict[str, Any]] = []
-
-    for top in range(0, H, step):
-        for left in range(0, W, step):
-            right = min(left + tile_size, W)
-            bottom = min(top + tile_size, H)
-            if right <= left or bottom <= top:
-                continue
-            crop = pil.crop((left, top, right, bottom))  # RGB crop
-            r = _predict_on_pil(model, crop, conf=conf, imgsz=imgsz, device=dev)
-            dets = _boxes_from_result(r)
-            # translate to global coords
-            for d in dets:
-                x1, y1, x2, y2 = d["bbox"]
-                d["bbox"] = (x1 + left, y1 + top, x2 + left, y2 + top)
-                all_dets.append(d)
-
-    # NMS across all tiles (class-wise)
-    merged = _nms_classwise(all_dets, iou_th=nms_iou)
-
-    annotated = None
-    if annotate:
-        bgr = cv2.cvtColor(np.array(pil), cv2.COLOR_RGB2BGR)
-        annotated = _draw_rects_bgr(bgr, merged)
-
-    t1 = time.time()
-    return _package(merged, int((t1 - t0) * 1000), annotated)
+            with timer.stage("draw"):
+                annotated = _draw_rects_bgr(img, dets)  # in place; the buffer is no longer needed
+        t1 = time.perf_counter()
+        res = _package(dets, W, H, int((t1 - t0) * 1000), annotated, extra, image_format, image_url, max_dim,
+                       timer=timer)
+    if token is not None:
+        res["result_token"] = token
+    if cache is not None:
+        cache.put(key, res)
+    stage_ms = timer.log(f"{W}x{H}")
+    observe_image(_tiles_inferred(extra), res["total"], stage_ms["total_ms"] / 1000)
+    return _with_timings(res, stage_ms, timings)
+
+def rethreshold(token: str, conf: float = 0.25, nms_iou: float = 0.50) -> Dict[str, Any] | None:
+    """
+    Re-apply the confidence filter and class-wise NMS to the raw detections stored under `token`
+    by run_inference(keep_raw=True); no decode, no model. None when the token is unknown/expired.
+    conf below the stored floor_conf cannot recover boxes the model never returned.
+    """
+    raw = load_raw(token)
+    if raw is None:
+        return None
+    t0 = time.perf_counter()
+    m = raw["scores"] >= conf
+    boxes, scores, classes = raw["boxes"][m], raw["scores"][m], raw["classes"][m]
+    nms = _nms_grid if len(scores) > GRID_NMS_MIN_BOXES else _nms_arrays
+    keep = nms(boxes, scores, classes, iou_th=nms_iou).tolist() if len(scores) else []
+    dets = [
+        {"class_name": str(classes[k]), "confidence": float(scores[k]), "bbox": tuple(boxes[k].tolist())}
+        for k in keep
+    ]
+    res = _package(dets, raw["width"], raw["height"], int((time.perf_counter() - t0) * 1000), None, raw["extra"])
+    res["result_token"] = token
+    res["floor_conf"] = raw["floor_conf"]
+    return res
@@ -0,0 +1,231 @@
+# detection/executors.py
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+from collections import deque
+import asyncio, functools, threading, logging, os
+import multiprocessing as mp
+from django.conf import settings
+
+from .metrics import set_admitted
+
+log = logging.getLogger(__name__)
+
+class Overloaded(Exception):
+    """More inference work is pending than YOLO_INFERENCE_MAX_PENDING allows."""
+
+class InputError(Exception):
+    """Stands in for an input that could not be read (e.g. a corrupt ZIP entry); infer_batch reports it as that item's error."""
+
+_POOL: ThreadPoolExecutor | None = None
+_POOL_LOCK = threading.Lock()
+_PENDING = 0
+
+def inference_executor() -> ThreadPoolExecutor:
+    """Dedicated, size-bounded pool for run_inference (YOLO_INFERENCE_WORKERS threads)."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ThreadPoolExecutor(
+                    max_workers=max(1, int(getattr(settings, "YOLO_INFERENCE_WORKERS", 2))),
+                    thread_name_prefix="yolo-infer",
+                )
+    return _POOL
+
+def pending() -> int:
+    return _PENDING
+
+def acquire_slot() -> None:
+    """
+    Admit one request to the inference pool; raises Overloaded when YOLO_INFERENCE_MAX_PENDING
+    (running + queued, 0 = unlimited) is already reached. Pair with release_slot().
+    """
+    global _PENDING
+    limit = int(getattr(settings, "YOLO_INFERENCE_MAX_PENDING", 0))
+    with _POOL_LOCK:
+        if limit and _PENDING >= limit:
+            raise Overloaded(f"{_PENDING} inference requests pending (limit {limit})")
+        _PENDING += 1
+        set_admitted(_PENDING)
+
+def release_slot() -> None:
+    global _PENDING
+    with _POOL_LOCK:
+        _PENDING -= 1
+        set_admitted(_PENDING)
+
+class inference_slot:
+    """async context manager around acquire_slot()/release_slot()."""
+    async def __aenter__(self):
+        acquire_slot()
+        return self
+
+    async def __aexit__(self, *exc):
+        release_slot()
+        return False
+
+async def run_in_inference_pool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor(), functools.partial(fn, *args, **kwargs))
+
+# ------------------ batch process pool ------------------
+
+_PROCS: ProcessPoolExecutor | None = None
+
+def _batch_worker_init(threads: int, forked: bool) -> None:
+    if forked:
+        # threads don't survive fork: drop handles to the parent's scheduler/thread pool
+        from . import scheduler
+        global _POOL, _POOL_LOCK
+        scheduler._SCHEDULER = None
+        scheduler._SCHEDULER_LOCK = threading.Lock()
+        from . import detector
+        detector._MODEL_LOCK = threading.Lock()
+        if detector._MODEL is not None:
+            detector._MODEL.after_fork()
+        _POOL, _POOL_LOCK = None, threading.Lock()
+    else:
+        import django
+        django.setup()
+        from .detector import _load_model
+        _load_model()
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+
+def _infer_bytes(data: bytes, params: Dict[str, Any]) -> Tuple[Dict[str, Any] | None, str | None]:
+    from .detector import run_inference
+    try:
+        return run_inference(data, **params), None
+    except Exception as e:
+        return None, str(e)
+
+def _new_batch_pool(n: int, method: str) -> ProcessPoolExecutor:
+    forked = method == "fork"
+    from .cpu import worker_threads
+    threads = max(1, (worker_threads() or os.cpu_count() or 1) // n)
+    procs = ProcessPoolExecutor(
+        max_workers=n,
+        mp_context=mp.get_context(method),
+        initializer=_batch_worker_init,
+        initargs=(threads, forked),
+    )
+    # start every worker now (a forked one inherits the loaded model as it is at this point)
+    try:
+        for f in [procs.submit(os.getpid) for _ in range(n)]:
+            f.result()
+    except BrokenProcessPool:
+        procs.shutdown(wait=False, cancel_futures=True)
+        raise  # not kept: the next call tries again
+    log.info("Started %d batch workers (%s, %d torch threads each)", n, method, threads)
+    return procs
+
+def start_batch_pool() -> ProcessPoolExecutor | None:
+    """
+    Fork the YOLO_BATCH_PROCESSES workers at server startup (warm_start(), model loaded, no
+    request or inference threads yet), so they share the weights copy-on-write and inherit no
+    lock held by another thread. No-op when 0, already started, or fork is unavailable.
+    """
+    global _PROCS
+    n = int(getattr(settings, "YOLO_BATCH_PROCESSES", 0))
+    if n <= 0 or "fork" not in mp.get_all_start_methods():
+        return _PROCS
+    with _POOL_LOCK:
+        if _PROCS is None:
+            _PROCS = _new_batch_pool(n, "fork")
+    return _PROCS
+
+def batch_process_pool() -> ProcessPoolExecutor | None:
+    """
+    Pool of YOLO_BATCH_PROCESSES workers for BatchDetectView (None when 0), normally forked at
+    startup by start_batch_pool(). Created here instead (no warm start, Windows, or replacing a
+    crashed pool), its workers come from a forkserver (spawned on Windows) and load the model
+    themselves: forking a process that already runs request and inference threads would copy
+    their locks in whatever state those threads left them.
+    """
+    global _PROCS
+    n = int(getattr(settings, "YOLO_BATCH_PROCESSES", 0))
+    if n <= 0:
+        return None
+    if _PROCS is None:
+        with _POOL_LOCK:
+            if _PROCS is None:
+                _PROCS = _new_batch_pool(n, "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+    return _PROCS
+
+def shutdown_batch_pool() -> None:
+    global _PROCS
+    with _POOL_LOCK:
+        if _PROCS is not None:
+            _PROCS.shutdown(wait=True)
+            _PROCS = None
+
+def _discard_broken_pool(pool: ProcessPoolExecutor) -> None:
+    """A worker died (crash, OOM kill): forget the pool so the next batch_process_pool() starts a new one."""
+    global _PROCS
+    with _POOL_LOCK:
+        if _PROCS is not pool:
+            return  # another batch already replaced it
+        _PROCS = None
+    log.error("Batch worker pool broken; it will be restarted for the next batch")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _pool_outcome(pool: ProcessPoolExecutor, fut: Future) -> Tuple[Dict[str, Any] | None, str | None]:
+    try:
+        return fut.result()
+    except BrokenProcessPool as e:
+        _discard_broken_pool(pool)
+        return None, f"Batch worker crashed: {e}"
+
+def infer_batch(named_inputs: Iterable[Tuple[str, Any]], params: Dict[str, Any],
+                stats: Dict[str, Any] | None = None) -> Iterator[Tuple[str, Dict[str, Any] | None, str | None]]:
+    """
+    (name, result, error) per input, in input order. Inputs are consumed lazily. Fans out over batch_process_pool() when
+    enabled, else overlaps decode/model/encode with the staged pipeline (YOLO_BATCH_PIPELINE),
+    else runs in this thread one image at a time. `stats`, if given, receives pipeline stage stats.
+    """
+    from .detector import run_inference, _read_bytes
+    from .pipeline import batch_pipeline
+    pool = batch_process_pool()
+    if pool is not None:
+        # bounded window of submissions: inputs are read (or unzipped) only just ahead of the workers
+        window: "deque[Tuple[str, Any]]" = deque()
+        limit = 2 * max(1, int(getattr(settings, "YOLO_BATCH_PROCESSES", 1)))
+        for name, f in named_inputs:
+            if isinstance(f, InputError):
+                fut = Future()
+                fut.set_result((None, str(f)))
+                window.append((name, fut))
+                continue
+            try:
+                fut = pool.submit(_infer_bytes, _read_bytes(f), params)
+            except BrokenProcessPool as e:
+                # broken by an earlier item; it and every later submit fail the same way
+                fut = Future()
+                fut.set_exception(e)
+            window.append((name, fut))
+            while len(window) >= limit:
+                name0, fut = window.popleft()
+                yield (name0, *_pool_outcome(pool, fut))
+        while window:
+            name0, fut = window.popleft()
+            yield (name0, *_pool_outcome(pool, fut))
+        return
+    pipe = batch_pipeline()
+    if pipe is not None:
+        yield from pipe.run(named_inputs, params)
+        if stats is not None:
+            stats.update(pipe.stats())
+        return
+    for name, f in named_inputs:
+        if isinstance(f, InputError):
+            yield name, None, str(f)
+            continue
+        try:
+            yield name, run_inference(f, **params), None
+        except Exception as e:
+            yield name, None, str(e)
@@ -0,0 +1,278 @@
+# detection/jobs.py
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List, Tuple
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+import os, shutil, socket, threading, time, uuid, zipfile, logging
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import DetectionJob, DetectionJobItem
+from .utils import merge_counts
+
+log = logging.getLogger(__name__)
+
+# ------------------ enqueue (web process) ------------------
+
+def _jobs_dir() -> Path:
+    d = Path(getattr(settings, "YOLO_JOBS_DIR", Path(settings.BASE_DIR) / "jobs"))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+def _save_upload(f, dest: Path) -> None:
+    with open(dest, "wb") as out:
+        if hasattr(f, "chunks"):
+            for chunk in f.chunks():
+                out.write(chunk)
+        else:
+            shutil.copyfileobj(f, out)
+
+# results are kept in the DB indefinitely: no base64 images in rows, no links to expiring artifacts
+_UNSTORED_PARAMS = ("annotate", "image_url", "image_format", "max_dim")
+
+def create_job(files, zip_file, params: Dict[str, Any], image_exts, limit: int = 0) -> DetectionJob:
+    """
+    Persist the uploads under YOLO_JOBS_DIR/<uuid>/ and enqueue one item per image.
+    A ZIP is stored as-is and read entry by entry by the workers. limit=0 means no cap.
+    Annotated-image params are dropped: jobs store detections only.
+    Raises zipfile.BadZipFile & co. on a broken archive, ValueError when there are no images.
+    """
+    params = {k: v for k, v in params.items() if k not in _UNSTORED_PARAMS}
+    job_dir = _jobs_dir() / uuid.uuid4().hex
+    job_dir.mkdir()
+    try:
+        entries: List[Tuple[str, str, str]] = []  # (name, source, member)
+        files = list(files)
+        if files:
+            for i, f in enumerate(files[:limit] if limit else files):
+                name = getattr(f, "name", None) or f"image{i}"
+                dest = job_dir / f"{i:06d}{Path(name).suffix.lower()}"
+                _save_upload(f, dest)
+                entries.append((name, str(dest), ""))
+        elif zip_file:
+            dest = job_dir / "input.zip"
+            _save_upload(zip_file, dest)
+            with zipfile.ZipFile(dest) as z:
+                for info in z.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(tuple(image_exts)):
+                        entries.append((info.filename, str(dest), info.filename))
+            if limit:
+                entries = entries[:limit]
+        if not entries:
+            raise ValueError("no images in upload")
+
+        with transaction.atomic():
+            job = DetectionJob.objects.create(params=params, input_dir=str(job_dir), num_items=len(entries))
+            DetectionJobItem.objects.bulk_create(
+                [DetectionJobItem(job=job, index=i, name=n, source=s, member=m) for i, (n, s, m) in enumerate(entries)],
+                batch_size=500,
+            )
+        return job
+    except Exception:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+# ------------------ progress (web process) ------------------
+
+def job_progress(job: DetectionJob) -> Dict[str, Any]:
+    """Status, per-state item counts and the job's running collection counts over finished items."""
+    by_status = {s: 0 for s, _ in DetectionJobItem.STATUS_CHOICES}
+    for row in job.items.order_by().values("status").annotate(n=Count("pk")):
+        by_status[row["status"]] = row["n"]
+    finished = by_status[DetectionJobItem.DONE] + by_status[DetectionJobItem.FAILED]
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "params": job.params,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "progress": {
+            "images": job.num_items,
+            "finished": finished,
+            "percent": round(100.0 * finished / job.num_items, 1) if job.num_items else 100.0,
+            **by_status,
+        },
+        "collection": {"counts": job.counts, "total": job.total},
+    }
+
+def job_items(job: DetectionJob, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    out = []
+    for it in job.items.all()[offset:offset + limit]:
+        entry: Dict[str, Any] = {"index": it.index, "name": it.name, "status": it.status}
+        if it.status == DetectionJobItem.DONE:
+            entry.update(it.result or {})
+            entry["name"] = it.name
+        elif it.status == DetectionJobItem.FAILED:
+            entry["error"] = it.error
+        out.append(entry)
+    return out
+
+# ------------------ worker side ------------------
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def requeue_stale(max_age_s: float) -> int:
+    """
+    Items whose claim was last refreshed more than max_age_s ago go back to pending. A live
+    worker refreshes claimed_at while it works (_heartbeat), so only dead workers' items match.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age_s)
+    return DetectionJobItem.objects.filter(status=DetectionJobItem.RUNNING, claimed_at__lt=cutoff).update(
+        status=DetectionJobItem.PENDING, claimed_by="", claimed_at=None
+    )
+
+def claim_next(worker: str) -> DetectionJobItem | None:
+    """Atomically claim the oldest pending item of a live job (safe with several workers)."""
+    while True:
+        item = (
+            DetectionJobItem.objects
+            .filter(status=DetectionJobItem.PENDING,
+                    job__status__in=(DetectionJob.QUEUED, DetectionJob.RUNNING))
+            .order_by("job_id", "index")
+            .only("pk", "job_id")
+            .first()
+        )
+        if item is None:
+            return None
+        now = timezone.now()
+        won = DetectionJobItem.objects.filter(pk=item.pk, status=DetectionJobItem.PENDING).update(
+            status=DetectionJobItem.RUNNING, claimed_by=worker, claimed_at=now
+        )
+        if won:
+            DetectionJob.objects.filter(pk=item.job_id, status=DetectionJob.QUEUED).update(
+                status=DetectionJob.RUNNING, started_at=now
+            )
+            return DetectionJobItem.objects.select_related("job").get(pk=item.pk)
+        # another worker got it first; try the next one
+
+def _item_bytes(item: DetectionJobItem, zips: Dict[str, zipfile.ZipFile]) -> bytes:
+    if not item.member:
+        with open(item.source, "rb") as fh:
+            return fh.read()
+    z = zips.get(item.source)
+    if z is None:
+        for old in zips.values():
+            old.close()
+        zips.clear()
+        z = zips[item.source] = zipfile.ZipFile(item.source)
+    with z.open(item.member) as f:
+        return f.read()
+
+def _remove_inputs(job_id: int) -> None:
+    input_dir = DetectionJob.objects.filter(pk=job_id).values_list("input_dir", flat=True).first()
+    if input_dir:
+        shutil.rmtree(input_dir, ignore_errors=True)
+
+def release_if_cancelled(job_id: int) -> bool:
+    """Delete a cancelled job's uploads once none of its items is running. True if the job is cancelled."""
+    if not DetectionJob.objects.filter(pk=job_id, status=DetectionJob.CANCELLED).exists():
+        return False
+    if not DetectionJobItem.objects.filter(job_id=job_id, status=DetectionJobItem.RUNNING).exists():
+        _remove_inputs(job_id)
+        log.info("Job %s cancelled; uploads removed", job_id)
+    return True
+
+def cancel_job(job_id: int) -> str | None:
+    """
+    Cancel a queued/running job: pending items are no longer claimed, items already running
+    finish normally and the last of them removes the uploads. Returns the job status, None if no such job.
+    """
+    DetectionJob.objects.filter(pk=job_id, status__in=(DetectionJob.QUEUED, DetectionJob.RUNNING)).update(
+        status=DetectionJob.CANCELLED
+    )
+    release_if_cancelled(job_id)
+    return DetectionJob.objects.filter(pk=job_id).values_list("status", flat=True).first()
+
+def _finish_job_if_complete(job_id: int) -> None:
+    if release_if_cancelled(job_id):
+        return  # its pending items stay pending for good
+    open_items = DetectionJobItem.objects.filter(
+        job_id=job_id, status__in=(DetectionJobItem.PENDING, DetectionJobItem.RUNNING)
+    )
+    if open_items.exists():
+        return
+    if DetectionJob.objects.filter(pk=job_id, status=DetectionJob.RUNNING).update(
+        status=DetectionJob.DONE, finished_at=timezone.now()
+    ):
+        job = DetectionJob.objects.get(pk=job_id)
+        shutil.rmtree(job.input_dir, ignore_errors=True)  # results live in the DB
+        log.info("Job %s done (%d images)", job_id, job.num_items)
+
+def _add_to_totals(job_id: int, counts: Dict[str, int], total: int) -> None:
+    """Fold one finished item into the job's running totals (call inside the item's transaction)."""
+    job = DetectionJob.objects.select_for_update().only("counts").get(pk=job_id)
+    DetectionJob.objects.filter(pk=job_id).update(
+        counts=merge_counts(dict(job.counts or {}), counts), total=F("total") + total
+    )
+
+@contextmanager
+def _heartbeat(item: DetectionJobItem, interval_s: float) -> Iterator[None]:
+    """Refresh the item's claimed_at every interval_s while the block runs (slow images are not stale)."""
+    stop = threading.Event()
+    mine = DetectionJobItem.objects.filter(pk=item.pk, status=DetectionJobItem.RUNNING, claimed_by=item.claimed_by)
+
+    def _beat():
+        try:
+            while not stop.wait(interval_s):
+                try:
+                    mine.update(claimed_at=timezone.now())
+                except Exception:
+                    log.exception("Heartbeat for job item %s failed", item.pk)
+        finally:
+            connection.close()  # this thread's own DB connection
+
+    t = threading.Thread(target=_beat, name="job-heartbeat", daemon=True)
+    t.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        t.join()
+
+def process_item(item: DetectionJobItem, zips: Dict[str, zipfile.ZipFile], heartbeat_s: float = 30.0) -> None:
+    from .detector import run_inference
+    from .views import batch_item
+    # results are only written while this worker still holds the claim (not requeued meanwhile)
+    mine = DetectionJobItem.objects.filter(pk=item.pk, status=DetectionJobItem.RUNNING, claimed_by=item.claimed_by)
+    try:
+        with _heartbeat(item, heartbeat_s):
+            res = run_inference(_item_bytes(item, zips), **item.job.params)
+    except Exception as e:
+        mine.update(status=DetectionJobItem.FAILED, error=str(e))
+    else:
+        counts = res.get("counts") or {}
+        total = int(res.get("total", 0))
+        with transaction.atomic():
+            if mine.update(status=DetectionJobItem.DONE, result=batch_item(item.name, res), counts=counts, total=total):
+                _add_to_totals(item.job_id, counts, total)
+            else:
+                log.warning("Job item %s was requeued while this worker ran it; result dropped", item.pk)
+    _finish_job_if_complete(item.job_id)
+
+def run_worker(poll_s: float = 2.0, once: bool = False, stale_s: float | None = None) -> int:
+    """Drain the queue; with once=True return when it is empty. Returns items processed."""
+    if stale_s is None:
+        stale_s = float(getattr(settings, "YOLO_JOB_STALE_S", 900))
+    heartbeat_s = min(float(getattr(settings, "YOLO_JOB_HEARTBEAT_S", 30)), stale_s / 3)
+    worker = _worker_id()
+    zips: Dict[str, zipfile.ZipFile] = {}
+    done = 0
+    try:
+        while True:
+            requeue_stale(stale_s)
+            item = claim_next(worker)
+            if item is None:
+                if once:
+                    return done
+                time.sleep(poll_s)
+                continue
+            process_item(item, zips, heartbeat_s)
+            done += 1
+    finally:
+        for z in zips.values():
+            z.close()
@@ -0,0 +1,70 @@
+# detection/management/commands/bench_backends.py
+from __future__ import annotations
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.detector import _bgr_from_file, _boxes_from_result, _configured_weights
+
+
+class Command(BaseCommand):
+    help = "Compare torch (Ultralytics) and ONNX Runtime CPU latency on one image."
+
+    def add_arguments(self, parser):
+        parser.add_argument("image", help="Test image (tiles of --imgsz are cut from its top-left)")
+        parser.add_argument("--weights", default=None, help="Default: active YoloModel / YOLO_MODEL_PATH")
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--conf", type=float, default=0.25)
+        parser.add_argument("--batches", default="1,8", help="Images per predict call")
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **opts):
+        from ultralytics import YOLO
+        from detection.backends import OnnxYolo, export_onnx
+
+        weights = opts["weights"] or _configured_weights()
+        if not weights:
+            raise CommandError("No weights configured")
+        try:
+            with open(opts["image"], "rb") as fh:
+                img = _bgr_from_file(fh.read())
+        except OSError as e:
+            raise CommandError(str(e))
+        s = opts["imgsz"]
+        tile = np.ascontiguousarray(img[:s, :s])
+
+        t0 = time.perf_counter()
+        onnx_path = export_onnx(weights, imgsz=s)
+        self.stdout.write(f"onnx: {onnx_path} (export/cache lookup {time.perf_counter() - t0:.1f}s)")
+        models = {"torch": YOLO(weights), "onnx": OnnxYolo(onnx_path)}
+
+        ref = None
+        self.stdout.write(f"{'backend':>8} {'batch':>6} {'ms/call':>9} {'ms/img':>8} {'dets':>5} {'vs torch':>9}")
+        for b in [int(x) for x in str(opts["batches"]).split(",") if x.strip()]:
+            src = [tile] * b
+            for name, model in models.items():
+                model.predict(source=src, conf=opts["conf"], imgsz=s, device="cpu", verbose=False)  # warm-up
+                times = []
+                for _ in range(opts["repeat"]):
+                    t0 = time.perf_counter()
+                    res = model.predict(source=src, conf=opts["conf"], imgsz=s, device="cpu", verbose=False)
+                    times.append((time.perf_counter() - t0) * 1000)
+                dets = _boxes_from_result(res[0])
+                if name == "torch":
+                    ref = dets
+                ms = float(np.median(times))
+                self.stdout.write(
+                    f"{name:>8} {b:>6} {ms:>9.1f} {ms / b:>8.1f} {len(dets):>5} {self._agree(ref, dets):>9}"
+                )
+
+    @staticmethod
+    def _agree(ref, dets) -> str:
+        """Share of reference boxes matched (same class, IoU >= 0.9)."""
+        from detection.detector import _iou_xyxy
+        if not ref:
+            return "-" if not dets else "0%"
+        hit = sum(
+            any(d["class_name"] == r["class_name"] and _iou_xyxy(d["bbox"], r["bbox"]) >= 0.9 for d in dets)
+            for r in ref
+        )
+        return f"{100 * hit / len(ref):.0f}%"
@@ -0,0 +1,58 @@
+# detection/management/commands/bench_batch.py
+from __future__ import annotations
+from pathlib import Path
+import os, time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from detection.detector import _load_model
+from detection.executors import infer_batch, start_batch_pool, shutdown_batch_pool
+from detection.views import IMAGE_EXTS
+
+
+class Command(BaseCommand):
+    help = "Batch throughput vs number of worker processes (YOLO_BATCH_PROCESSES)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="An image (repeated --count times) or a folder of images")
+        parser.add_argument("--count", type=int, default=32)
+        parser.add_argument("--workers", default=None, help="Comma-separated process counts; 0 = sequential")
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--tile", default="auto")
+
+    @override_settings(YOLO_RESULT_CACHE_MB=0)  # repeated images must run the model, not hit the cache
+    def handle(self, *args, **opts):
+        src = Path(opts["source"])
+        if src.is_dir():
+            paths = sorted(p for p in src.iterdir() if p.suffix.lower() in IMAGE_EXTS)[: opts["count"]]
+        elif src.is_file():
+            paths = [src] * opts["count"]
+        else:
+            raise CommandError(f"{src} not found")
+        inputs = [(p.name, p.read_bytes()) for p in paths]
+        params = {"imgsz": opts["imgsz"], "device": "cpu", "tile": opts["tile"]}
+
+        cpus = os.cpu_count() or 1
+        if opts["workers"]:
+            workers = [int(w) for w in opts["workers"].split(",") if w.strip()]
+        else:
+            workers = [0] + [n for n in (1, 2, 4, 8, 16) if n <= cpus]
+
+        os.environ["YOLO_RESULT_CACHE_MB"] = "0"  # spawned (Windows) workers read settings from the env
+        _load_model()
+        self.stdout.write(f"{len(inputs)} images, {cpus} CPUs")
+        self.stdout.write(f"{'workers':>8} {'wall_s':>8} {'img/s':>7} {'speedup':>8} {'errors':>7}")
+        base = None
+        for n in workers:
+            shutdown_batch_pool()
+            with override_settings(YOLO_BATCH_PROCESSES=n):
+                start_batch_pool()  # forked as at server startup
+                list(infer_batch(inputs[:max(1, n)], params))  # warm-up
+                t0 = time.perf_counter()
+                out = list(infer_batch(inputs, params))
+                wall = time.perf_counter() - t0
+            shutdown_batch_pool()
+            base = base or wall
+            errors = sum(1 for _, _, err in out if err is not None)
+            label = "seq" if n == 0 else str(n)
+            self.stdout.write(f"{label:>8} {wall:>8.2f} {len(inputs) / wall:>7.2f} {base / wall:>7.2f}x {errors:>7}")
@@ -0,0 +1,194 @@
+# detection/management/commands/bench_memory.py
+from __future__ import annotations
+from typing import Dict, Any
+import os, time, tempfile, tracemalloc
+import multiprocessing as mp
+import numpy as np
+import cv2
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _proc_kb(field: str) -> int | None:
+    """VmRSS / VmHWM from /proc (Linux); None elsewhere."""
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_kb() -> int:
+    hwm = _proc_kb("VmHWM")
+    if hwm is not None:
+        return hwm
+    import resource
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def _grid(W: int, H: int, tile_size: int, overlap: float):
+    step = max(1, int(tile_size * (1.0 - overlap)))
+    for top in range(0, H, step):
+        for left in range(0, W, step):
+            right, bottom = min(left + tile_size, W), min(top + tile_size, H)
+            if right > left and bottom > top:
+                yield left, top, right, bottom
+
+
+class _Allocs:
+    """
+    Buffers allocated inside begin()/end() sections, from tracemalloc snapshot diffs. numpy arrays
+    and bytes objects are traced, PIL's own image memory is not; per-line growth below
+    `min_bytes` is interpreter bookkeeping and ignored. Disabled, begin()/end() cost nothing.
+    """
+
+    def __init__(self, enabled: bool, min_bytes: int = 4096):
+        self.enabled = enabled
+        self.min_bytes = min_bytes
+        self.count = 0
+        self.bytes = 0
+        self._before = None
+        if enabled:
+            # the first snapshots allocate tracemalloc's own caches; keep them out of the counts
+            self.begin()
+            self.end()
+            self.count = self.bytes = 0
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def begin(self) -> None:
+        if self.enabled:
+            self._before = self._snapshot()
+
+    def end(self) -> None:
+        if not self.enabled:
+            return
+        for d in self._snapshot().compare_to(self._before, "lineno"):
+            if d.size_diff >= self.min_bytes:
+                self.count += max(0, d.count_diff)
+                self.bytes += d.size_diff
+        self._before = None
+
+
+def _run_pil(data: bytes, tile_size: int, overlap: float, imgsz: int, annotate: bool, allocs: _Allocs) -> int:
+    """The previous pipeline: PIL decode, PIL.crop per tile, RGB->BGR array per tile, full copy to annotate."""
+    from detection.detector import _pil_from_file
+    pil = _pil_from_file(data)
+    W, H = pil.size
+    tiles = 0
+    for box in _grid(W, H, tile_size, overlap):
+        allocs.begin()
+        crop = pil.crop(box)                                       # new RGB image
+        arr = np.ascontiguousarray(np.asarray(crop)[:, :, ::-1])   # what Ultralytics does with PIL input
+        allocs.end()
+        cv2.resize(arr, (imgsz, imgsz))
+        del crop, arr  # freed before the next section's baseline snapshot
+        tiles += 1
+    if annotate:
+        allocs.begin()
+        bgr = cv2.cvtColor(np.array(pil), cv2.COLOR_RGB2BGR)
+        allocs.end()
+        cv2.imencode(".jpg", bgr)
+    return tiles
+
+
+def _run_ndarray(data: bytes, tile_size: int, overlap: float, imgsz: int, annotate: bool, allocs: _Allocs) -> int:
+    """Current pipeline: one decoded BGR buffer, strided tile views, annotation in place."""
+    from detection.detector import _bgr_from_file
+    img = _bgr_from_file(data)
+    H, W = img.shape[:2]
+    tiles = 0
+    for left, top, right, bottom in _grid(W, H, tile_size, overlap):
+        allocs.begin()
+        view = img[top:bottom, left:right]
+        allocs.end()
+        cv2.resize(view, (imgsz, imgsz))
+        tiles += 1
+    if annotate:
+        cv2.imencode(".jpg", img)
+    return tiles
+
+
+STRATEGIES = {"pil": _run_pil, "ndarray": _run_ndarray}
+
+
+def _measure(strategy: str, path: str, opts: Dict[str, Any], q) -> None:
+    with open(path, "rb") as fh:
+        data = fh.read()
+    try:  # reset VmHWM so the peak covers only the measured section
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+    rss0 = _proc_kb("VmRSS") or _peak_kb()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    args = (data, opts["tile_size"], opts["overlap"], opts["imgsz"], opts["annotate"])
+    tiles = STRATEGIES[strategy](*args, _Allocs(False))
+    elapsed = (time.perf_counter() - t0) * 1000
+    _, traced_peak = tracemalloc.get_traced_memory()
+    peak_kb = _peak_kb()
+    # second, untimed pass: snapshot diffs around the tile (and annotation) buffers
+    allocs = _Allocs(True)
+    STRATEGIES[strategy](*args, allocs)
+    tracemalloc.stop()
+    q.put({
+        "strategy": strategy,
+        "ms": elapsed,
+        "tiles": tiles,
+        "allocs": allocs.count,
+        "alloc_mb": allocs.bytes / 2**20,
+        "peak_rss_mb": max(0, peak_kb - rss0) / 1024,
+        "traced_peak_mb": traced_peak / 2**20,
+    })
+
+
+class Command(BaseCommand):
+    help = "Compare peak RSS and buffer allocations of PIL-crop tiling vs zero-copy ndarray tiling (no model needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("image", nargs="?", help="Test image; omitted = synthetic JPEG of --mp megapixels")
+        parser.add_argument("--mp", type=float, default=120.0)
+        parser.add_argument("--tile-size", type=int, default=640)
+        parser.add_argument("--overlap", type=float, default=0.20)
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--annotate", action="store_true")
+
+    def handle(self, *args, **opts):
+        path, tmp = opts["image"], None
+        if not path:
+            side = int(np.sqrt(opts["mp"] * 1e6 / 1.5))
+            W, H = int(side * 1.5), side
+            rng = np.random.default_rng(0)
+            small = rng.integers(0, 255, size=(H // 32 + 1, W // 32 + 1, 3), dtype=np.uint8)
+            synth = cv2.resize(small, (W, H), interpolation=cv2.INTER_LINEAR)
+            ok, buf = cv2.imencode(".jpg", synth, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
+            if not ok:
+                raise CommandError("Failed to encode synthetic image")
+            fd, tmp = tempfile.mkstemp(suffix=".jpg")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(buf.tobytes())
+            path = tmp
+            del synth, buf
+            self.stdout.write(f"synthetic image: {W}x{H} ({W * H / 1e6:.0f} MP)")
+
+        ctx = mp.get_context("spawn")
+        try:
+            self.stdout.write(f"{'strategy':>8} {'ms':>9} {'tiles':>6} {'allocs':>7} {'alloc_mb':>9} {'peak_rss_mb':>12} {'traced_mb':>10}")
+            for name in STRATEGIES:
+                q = ctx.Queue()
+                p = ctx.Process(target=_measure, args=(name, path, opts, q))
+                p.start()
+                r = q.get()
+                p.join()
+                self.stdout.write(
+                    f"{r['strategy']:>8} {r['ms']:>9.0f} {r['tiles']:>6} {r['allocs']:>7} {r['alloc_mb']:>9.1f} "
+                    f"{r['peak_rss_mb']:>12.1f} {r['traced_peak_mb']:>10.1f}"
+                )
+        finally:
+            if tmp:
+                os.unlink(tmp)
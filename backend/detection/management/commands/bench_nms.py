@@ -0,0 +1,101 @@
+# detection/management/commands/bench_nms.py
+from __future__ import annotations
+from typing import List, Dict, Any
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from detection.detector import _iou_xyxy, _nms_arrays, _nms_grid, _nms_classwise
+
+
+def _nms_classwise_loop(dets: List[Dict[str, Any]], iou_th: float = 0.5) -> List[Dict[str, Any]]:
+    """The original pure-Python NMS, kept here as the reference implementation."""
+    out: List[Dict[str, Any]] = []
+    by_cls: Dict[str, List[int]] = {}
+    for i, d in enumerate(dets):
+        by_cls.setdefault(d["class_name"], []).append(i)
+    for _, idxs in by_cls.items():
+        idxs = sorted(idxs, key=lambda i: dets[i]["confidence"], reverse=True)
+        keep: List[int] = []
+        while idxs:
+            i = idxs.pop(0)
+            keep.append(i)
+            xi = dets[i]["bbox"]
+            idxs = [j for j in idxs if _iou_xyxy(xi, dets[j]["bbox"]) < iou_th]
+        out.extend(dets[k] for k in keep)
+    return out
+
+
+def _synthetic(n: int, classes: int, rng: np.random.Generator, density: float = 2.0):
+    """Random boxes on a square canvas sized so each box has ~`density` neighbours."""
+    side = float(np.sqrt(n / max(density, 1e-6)) * 40.0)
+    wh = rng.uniform(15.0, 60.0, size=(n, 2))
+    xy = rng.uniform(0.0, side, size=(n, 2))
+    boxes = np.concatenate([xy, xy + wh], axis=1)
+    scores = rng.uniform(0.05, 1.0, size=n)
+    cls = rng.integers(0, classes, size=n)
+    return boxes, scores, cls
+
+
+class Command(BaseCommand):
+    help = "Benchmark the vectorized and grid-indexed class-wise NMS against the pure-Python loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000,100000",
+                            help="Comma-separated box counts")
+        parser.add_argument("--classes", type=int, default=3)
+        parser.add_argument("--iou", type=float, default=0.5)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--loop-max", type=int, default=10000,
+                            help="Skip the Python loop above this many boxes (it is O(n^2))")
+        parser.add_argument("--dense-max", type=int, default=20000,
+                            help="Skip the dense NumPy NMS above this many boxes (quadratic per class)")
+        parser.add_argument("--density", type=float, default=2.0,
+                            help="Average overlapping neighbours per box in the synthetic scene")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(opts["seed"])
+        sizes = [int(s) for s in str(opts["sizes"]).split(",") if s.strip()]
+        iou = opts["iou"]
+
+        self.stdout.write(f"{'boxes':>8} {'kept':>8} {'grid_ms':>9} {'dense_ms':>9} {'dicts_ms':>9} {'loop_ms':>10} {'speedup':>8} match")
+        for n in sizes:
+            boxes, scores, cls = _synthetic(n, opts["classes"], rng, density=opts["density"])
+
+            def best_of(fn):
+                ts, out = [], None
+                for _ in range(opts["repeat"]):
+                    t0 = time.perf_counter()
+                    out = fn(boxes, scores, cls, iou_th=iou)
+                    ts.append((time.perf_counter() - t0) * 1000)
+                return min(ts), out
+
+            grid_ms, keep = best_of(_nms_grid)
+            dense_ms, match = None, "-"
+            if n <= opts["dense_max"]:
+                dense_ms, dense_keep = best_of(_nms_arrays)
+                match = "yes" if np.array_equal(keep, dense_keep) else "NO"
+
+            dets = [
+                {"class_name": str(int(c)), "confidence": float(s), "bbox": tuple(float(v) for v in b)}
+                for b, s, c in zip(boxes.tolist(), scores.tolist(), cls.tolist())
+            ]
+            t0 = time.perf_counter()
+            vec = _nms_classwise(dets, iou_th=iou)
+            t_dict = (time.perf_counter() - t0) * 1000
+
+            loop_ms = None
+            if n <= opts["loop_max"]:
+                t0 = time.perf_counter()
+                ref = _nms_classwise_loop(dets, iou_th=iou)
+                loop_ms = (time.perf_counter() - t0) * 1000
+                ok = [id(d) for d in ref] == [id(d) for d in vec]
+                match = "yes" if ok and match != "NO" else "NO"
+
+            fmt = lambda v: f"{v:.2f}" if v is not None else "-"
+            speedup = f"{loop_ms / t_dict:.1f}x" if loop_ms else "-"
+            self.stdout.write(
+                f"{n:>8} {len(keep):>8} {grid_ms:>9.2f} {fmt(dense_ms):>9} {t_dict:>9.2f} "
+                f"{fmt(loop_ms):>10} {speedup:>8} {match}"
+            )
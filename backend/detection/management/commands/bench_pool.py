@@ -0,0 +1,66 @@
+# detection/management/commands/bench_pool.py
+from __future__ import annotations
+import time, threading
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from detection import detector
+from detection.detector import run_inference, _load_model
+
+
+class Command(BaseCommand):
+    help = "Concurrent-client load test of run_inference for several model pool sizes (replicas per process)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("image")
+        parser.add_argument("--sizes", default="1,2,4", help="Comma-separated YOLO_MODEL_POOL_SIZE values")
+        parser.add_argument("--clients", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=10, help="Requests per client")
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--tile", default="auto")
+
+    def _load(self, data: bytes, opts) -> dict:
+        lat = []
+        lock = threading.Lock()
+
+        def client():
+            for _ in range(opts["requests"]):
+                t0 = time.perf_counter()
+                run_inference(data, imgsz=opts["imgsz"], device="cpu", tile=opts["tile"])
+                with lock:
+                    lat.append((time.perf_counter() - t0) * 1000)
+
+        threads = [threading.Thread(target=client) for _ in range(opts["clients"])]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        a = np.asarray(lat)
+        return {"p50": np.percentile(a, 50), "p95": np.percentile(a, 95), "rps": a.size / wall}
+
+    def handle(self, *args, **opts):
+        try:
+            with open(opts["image"], "rb") as fh:
+                data = fh.read()
+        except OSError as e:
+            raise CommandError(str(e))
+        sizes = [int(s) for s in opts["sizes"].split(",") if s.strip()]
+
+        self.stdout.write(f"{opts['clients']} clients x {opts['requests']} requests")
+        self.stdout.write(f"{'replicas':>8} {'p50_ms':>9} {'p95_ms':>9} {'req/s':>7} {'util':>6} {'wait_p95':>9}")
+        for n in sizes:
+            # every request must run the model: no result cache
+            with override_settings(YOLO_MODEL_POOL_SIZE=n, YOLO_RESULT_CACHE_MB=0):
+                detector._MODEL = None
+                _load_model()
+                run_inference(data, imgsz=opts["imgsz"], device="cpu", tile=opts["tile"])  # warm-up
+                pool = _load_model()
+                pool.reset_stats()  # stats cover the measured run only
+                r = self._load(data, opts)
+                st = pool.stats()
+            self.stdout.write(f"{n:>8} {r['p50']:>9.1f} {r['p95']:>9.1f} {r['rps']:>7.2f} "
+                              f"{st['utilization']:>6.2f} {st['wait_ms']['p95'] or 0:>9.1f}")
+        detector._MODEL = None
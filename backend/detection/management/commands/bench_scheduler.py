@@ -0,0 +1,64 @@
+# detection/management/commands/bench_scheduler.py
+from __future__ import annotations
+import time, threading
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from detection.detector import run_inference, _load_model
+from detection.scheduler import get_scheduler
+
+
+class Command(BaseCommand):
+    help = "Concurrent-client load test of run_inference with and without cross-request micro-batching."
+
+    def add_arguments(self, parser):
+        parser.add_argument("image")
+        parser.add_argument("--clients", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=10, help="Requests per client")
+        parser.add_argument("--max-batch", type=int, default=8)
+        parser.add_argument("--max-wait-ms", type=float, default=5.0)
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--tile", default="0")
+
+    def _load(self, data: bytes, opts) -> dict:
+        lat = []
+        lock = threading.Lock()
+
+        def client():
+            for _ in range(opts["requests"]):
+                t0 = time.perf_counter()
+                run_inference(data, imgsz=opts["imgsz"], device="cpu", tile=opts["tile"])
+                with lock:
+                    lat.append((time.perf_counter() - t0) * 1000)
+
+        threads = [threading.Thread(target=client) for _ in range(opts["clients"])]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        a = np.asarray(lat)
+        return {"p50": np.percentile(a, 50), "p95": np.percentile(a, 95), "rps": a.size / wall}
+
+    @override_settings(YOLO_RESULT_CACHE_MB=0)  # repeated images must run the model, not hit the cache
+    def handle(self, *args, **opts):
+        try:
+            with open(opts["image"], "rb") as fh:
+                data = fh.read()
+        except OSError as e:
+            raise CommandError(str(e))
+        _load_model()
+        run_inference(data, imgsz=opts["imgsz"], device="cpu", tile=opts["tile"])  # warm-up
+
+        self.stdout.write(f"{'mode':>10} {'p50_ms':>9} {'p95_ms':>9} {'req/s':>7}")
+        for enabled in (False, True):
+            with override_settings(YOLO_MICROBATCH=enabled, YOLO_MICROBATCH_MAX_BATCH=opts["max_batch"],
+                                   YOLO_MICROBATCH_MAX_WAIT_MS=opts["max_wait_ms"]):
+                r = self._load(data, opts)
+                sched = get_scheduler()
+            mode = "batched" if enabled else "direct"
+            self.stdout.write(f"{mode:>10} {r['p50']:>9.1f} {r['p95']:>9.1f} {r['rps']:>7.2f}")
+            if enabled and sched is not None:
+                self.stdout.write(f"scheduler: {sched.stats()}")
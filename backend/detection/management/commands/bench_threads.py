@@ -0,0 +1,94 @@
+# detection/management/commands/bench_threads.py
+from __future__ import annotations
+from typing import List
+import time, queue
+import multiprocessing as mp
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.cpu import available_cores, apply_threads, plan_layout
+from detection.detector import _bgr_from_file, _configured_weights
+
+
+def _worker(weights: str, tile: np.ndarray, imgsz: int, threads: int, cores: List[int] | None,
+            seconds: float, barrier, out) -> None:
+    """One simulated uvicorn worker: pin/cap threads, load, warm up, then predict in a loop."""
+    apply_threads(threads, 1, cores)
+    from ultralytics import YOLO
+    model = YOLO(weights)
+    for _ in range(2):
+        model.predict(source=tile, imgsz=imgsz, device="cpu", verbose=False)
+    barrier.wait(timeout=600)  # a worker that failed to load breaks the barrier for all
+    lat = []
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        t0 = time.perf_counter()
+        model.predict(source=tile, imgsz=imgsz, device="cpu", verbose=False)
+        lat.append((time.perf_counter() - t0) * 1000)
+    out.put(lat)
+
+
+class Command(BaseCommand):
+    help = "Throughput/latency of worker x thread layouts (all workers predicting concurrently)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("image", help="Test image (a --imgsz tile is cut from its top-left)")
+        parser.add_argument("--weights", default=None, help="Default: active YoloModel / YOLO_MODEL_PATH")
+        parser.add_argument("--layouts", default=None,
+                            help="Comma-separated WORKERSxTHREADS, e.g. 4x2,4x8 (default: splits of all cores, "
+                                 "plus N workers x all cores to show oversubscription)")
+        parser.add_argument("--affinity", action="store_true", help="Also run each layout pinned to disjoint cores")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Measured run per layout")
+        parser.add_argument("--imgsz", type=int, default=640)
+
+    def handle(self, *args, **opts):
+        weights = opts["weights"] or _configured_weights()
+        if not weights:
+            raise CommandError("No weights configured")
+        try:
+            with open(opts["image"], "rb") as fh:
+                img = _bgr_from_file(fh.read())
+        except OSError as e:
+            raise CommandError(str(e))
+        s = opts["imgsz"]
+        tile = np.ascontiguousarray(img[:s, :s])
+
+        ncpu = len(available_cores())
+        if opts["layouts"]:
+            try:
+                layouts = [tuple(int(v) for v in x.lower().split("x")) for x in opts["layouts"].split(",") if x.strip()]
+            except ValueError:
+                raise CommandError("--layouts expects WORKERSxTHREADS pairs, e.g. 2x4,4x2")
+        else:
+            layouts = [(w, max(1, ncpu // w)) for w in (1, 2, 4, 8) if w <= ncpu]
+            layouts += [(w, ncpu) for w in (2, 4) if w <= ncpu]  # every worker on all cores (the default)
+        pin = [False, True] if opts["affinity"] else [False]
+
+        ctx = mp.get_context("spawn")  # fresh interpreters: thread pools are fixed on first torch use
+        self.stdout.write(f"{ncpu} cores, {opts['seconds']:.0f}s per layout")
+        self.stdout.write(f"{'workers':>7} {'threads':>7} {'pinned':>6} {'img/s':>7} {'p50_ms':>8} {'p95_ms':>8}")
+        for workers, threads in layouts:
+            for pinned in pin:
+                barrier, out = ctx.Barrier(workers), ctx.Queue()
+                procs = []
+                for slot in range(workers):
+                    cores = plan_layout(0, workers, threads, affinity=pinned, slot=slot)["cores"]
+                    procs.append(ctx.Process(target=_worker, args=(weights, tile, s, threads, cores,
+                                                                   opts["seconds"], barrier, out)))
+                for p in procs:
+                    p.start()
+                try:
+                    lat = np.array([v for _ in procs for v in out.get(timeout=opts["seconds"] + 660)])
+                except queue.Empty:
+                    for p in procs:
+                        p.terminate()
+                    raise CommandError(f"Layout {workers}x{threads}: a worker failed (see its traceback above)")
+                for p in procs:
+                    p.join()
+                if lat.size == 0:
+                    self.stdout.write(f"{workers:>7} {threads:>7} {str(pinned):>6}  no completed predictions")
+                    continue
+                self.stdout.write(
+                    f"{workers:>7} {threads:>7} {str(pinned):>6} {lat.size / opts['seconds']:>7.1f} "
+                    f"{np.percentile(lat, 50):>8.1f} {np.percentile(lat, 95):>8.1f}"
+                )
@@ -0,0 +1,68 @@
+# detection/management/commands/bench_tiles.py
+from __future__ import annotations
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from detection.detector import run_inference, _load_model
+
+
+def _match(ref, other, tol: float = 1.0) -> str:
+    """Compare two detection lists by class and box (pixels); returns a short verdict."""
+    if len(ref) != len(other):
+        return f"count {len(ref)} vs {len(other)}"
+    key = lambda d: (d["class_name"], round(d["bbox"]["x1"]), round(d["bbox"]["y1"]))
+    worst = 0.0
+    for a, b in zip(sorted(ref, key=key), sorted(other, key=key)):
+        if a["class_name"] != b["class_name"]:
+            return "class mismatch"
+        worst = max(worst, *(abs(a["bbox"][k] - b["bbox"][k]) for k in ("x1", "y1", "x2", "y2")))
+    return "yes" if worst <= tol else f"max box delta {worst:.1f}px"
+
+
+class Command(BaseCommand):
+    help = "Time tiled inference on one image for several tile_batch sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("image", help="Path to a (large) test image")
+        parser.add_argument("--batches", default="1,4,8,16", help="Comma-separated tile_batch values")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--conf", type=float, default=0.25)
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--tile-size", type=int, default=640)
+        parser.add_argument("--overlap", type=float, default=0.20)
+        parser.add_argument("--device", default="cpu")
+
+    @override_settings(YOLO_RESULT_CACHE_MB=0)  # repeated images must run the model, not hit the cache
+    def handle(self, *args, **opts):
+        try:
+            with open(opts["image"], "rb") as fh:
+                data = fh.read()
+        except OSError as e:
+            raise CommandError(str(e))
+
+        _load_model()
+        kw = dict(conf=opts["conf"], imgsz=opts["imgsz"], device=opts["device"], tile="1",
+                  tile_size=opts["tile_size"], overlap=opts["overlap"])
+        batches = [int(b) for b in str(opts["batches"]).split(",") if b.strip()]
+
+        # warm-up so the first timed configuration does not pay model init
+        run_inference(data, tile_batch=1, **kw)
+
+        ref = None
+        base_ms = None
+        self.stdout.write(f"{'tile_batch':>10} {'best_ms':>9} {'mean_ms':>9} {'speedup':>8} {'dets':>6} match")
+        for b in batches:
+            times = []
+            res = None
+            for _ in range(opts["repeat"]):
+                t0 = time.perf_counter()
+                res = run_inference(data, tile_batch=b, **kw)
+                times.append((time.perf_counter() - t0) * 1000)
+            best, mean = min(times), sum(times) / len(times)
+            if ref is None:
+                ref, base_ms = res["detections"], best
+            self.stdout.write(
+                f"{b:>10} {best:>9.1f} {mean:>9.1f} {base_ms / best:>7.2f}x "
+                f"{len(res['detections']):>6} {_match(ref, res['detections'])}"
+            )
@@ -0,0 +1,25 @@
+# detection/management/commands/detection_worker.py
+from __future__ import annotations
+from django.core.management.base import BaseCommand
+
+from detection.cpu import configure_worker
+from detection.detector import _load_model
+from detection.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Process queued batch jobs (POST /api/jobs/). Run several for parallelism; each claims items atomically."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    def handle(self, *args, **opts):
+        configure_worker()
+        _load_model()  # pay the load before claiming anything
+        self.stdout.write("Worker ready, waiting for jobs...")
+        try:
+            n = run_worker(poll_s=opts["poll"], once=opts["once"])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f"Processed {n} images"))
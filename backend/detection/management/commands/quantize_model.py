@@ -0,0 +1,79 @@
+# detection/management/commands/quantize_model.py
+from __future__ import annotations
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.models import YoloModel
+
+
+class Command(BaseCommand):
+    help = ("Build an INT8 (ONNX Runtime static quantization) variant of a registered YoloModel, "
+            "record its latency and mAP deltas vs FP32, and optionally serve it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", help="YoloModel id or name")
+        parser.add_argument("--calib", required=True, help="Folder of calibration images (searched recursively)")
+        parser.add_argument("--calib-images", type=int, default=200, help="Use at most this many (0 = all)")
+        parser.add_argument("--val", default=None,
+                            help="Validation folder (default: --calib). YOLO .txt labels next to the images "
+                                 "or in a sibling labels/ folder are used as ground truth when present.")
+        parser.add_argument("--val-images", type=int, default=100)
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs per validation image")
+        parser.add_argument("--keep-head-int8", action="store_true",
+                            help="Also quantize the detect head (faster, usually less accurate)")
+        parser.add_argument("--serve", action="store_true",
+                            help="Set serve_int8 if the variant passes --max-map-drop and is faster "
+                                 "(otherwise it is cleared: the stored graph is replaced either way)")
+        parser.add_argument("--max-map-drop", type=float, default=0.01, help="Allowed mAP@0.5 loss for --serve")
+
+    def handle(self, *args, **opts):
+        from detection.backends import export_onnx
+        from detection.quantize import list_images, quantize_onnx, compare
+
+        key = opts["model"]
+        m = YoloModel.objects.filter(pk=int(key)).first() if key.isdigit() else YoloModel.objects.filter(name=key).first()
+        if m is None:
+            raise CommandError(f"No YoloModel {key!r}")
+        calib = list_images(opts["calib"], opts["calib_images"])
+        val = list_images(opts["val"] or opts["calib"], opts["val_images"])
+        if not calib or not val:
+            raise CommandError("No calibration/validation images found")
+        if not opts["val"]:
+            self.stdout.write(self.style.WARNING("Validating on the calibration images; pass --val for an unbiased check"))
+
+        s = opts["imgsz"]
+        fp32 = export_onnx(m.weights_path, imgsz=s)
+        self.stdout.write(f"FP32 graph: {fp32}")
+        try:
+            int8 = quantize_onnx(fp32, calib, imgsz=s, exclude_head=not opts["keep_head_int8"])
+        except (RuntimeError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"INT8 graph: {int8} ({len(calib)} calibration images)")
+
+        rep = compare(fp32, int8, val, imgsz=s, repeat=opts["repeat"])
+        self.stdout.write(f"{'':>6} {'ms/img':>8} {'mAP50':>7} {'mAP50-95':>9}   ({rep['images']} images, "
+                          f"reference: {rep['reference']})")
+        for k in ("fp32", "int8"):
+            self.stdout.write(f"{k:>6} {rep[k + '_latency_ms']:>8.1f} {rep[k + '_map50']:>7.4f} {rep[k + '_map50_95']:>9.4f}")
+        self.stdout.write(f"speedup {rep['speedup']}x, mAP50 delta {rep['map50_delta']:+.4f}, "
+                          f"mAP50-95 delta {rep['map50_95_delta']:+.4f}")
+
+        m.int8_path = int8
+        m.fp32_latency_ms = rep["fp32_latency_ms"]
+        m.int8_latency_ms = rep["int8_latency_ms"]
+        m.int8_map_delta = rep["map50_delta"]
+        m.int8_map_5095_delta = rep["map50_95_delta"]
+        m.int8_report = rep
+        # int8_path now points at the new graph: only serve it if this run approves it
+        m.serve_int8 = False
+        if opts["serve"]:
+            if -rep["map50_delta"] > opts["max_map_drop"]:
+                self.stdout.write(self.style.WARNING(f"Not serving: mAP50 drop exceeds {opts['max_map_drop']}"))
+            elif rep["int8_latency_ms"] >= rep["fp32_latency_ms"]:
+                self.stdout.write(self.style.WARNING("Not serving: INT8 is not faster on this CPU"))
+            else:
+                m.serve_int8 = True
+        m.save(update_fields=["int8_path", "serve_int8", "fp32_latency_ms", "int8_latency_ms",
+                              "int8_map_delta", "int8_map_5095_delta", "int8_report"])
+        state = "serving INT8" if m.serve_int8 else "serving FP32"
+        self.stdout.write(self.style.SUCCESS(f"Recorded on {m} ({state}; restart workers to reload)"))
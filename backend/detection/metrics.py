@@ -0,0 +1,137 @@
+# detection/metrics.py
+from __future__ import annotations
+from typing import Iterator
+from contextlib import contextmanager
+import atexit, os, time, logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+log = logging.getLogger(__name__)
+
+# Prometheus metrics (optional dependency: prometheus_client). With uvicorn --workers N, set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory before starting the server: every worker (and
+# batch process) then writes its samples there and /api/metrics aggregates all of them.
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+    ENABLED = True
+except ImportError:
+    ENABLED = False
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+if ENABLED:
+    REQUESTS = Counter("yolo_http_requests_total", "HTTP requests", ["endpoint", "method", "status"])
+    LATENCY = Histogram("yolo_http_request_duration_seconds", "Time to produce the response (streaming: until "
+                        "the first byte)", ["endpoint"], buckets=LATENCY_BUCKETS)
+    IMAGE_SECONDS = Histogram("yolo_image_seconds", "Per-image read..encode time", buckets=LATENCY_BUCKETS)
+    TILES = Histogram("yolo_image_tiles", "Tiles per image (1 = single pass)",
+                      buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+    DETECTIONS = Histogram("yolo_image_detections", "Detections per image after NMS",
+                           buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+    IN_FLIGHT = Gauge("yolo_inference_in_flight", "Images currently being processed", multiprocess_mode="livesum")
+    QUEUE = Gauge("yolo_inference_admitted", "Async requests admitted to the inference pool (running + queued)",
+                  multiprocess_mode="livesum")
+    MODEL_LOAD = Gauge("yolo_model_load_seconds", "Time taken by the last model load", multiprocess_mode="max")
+    MODEL_INFO = Gauge("yolo_model_info", "Loaded weights (value 1)", ["weights", "backend"], multiprocess_mode="max")
+    RSS = Gauge("yolo_process_resident_memory_bytes", "Resident set size per worker process",
+                multiprocess_mode="liveall")
+
+    if MULTIPROC_DIR:
+        @atexit.register
+        def _mark_dead():
+            # drop this worker's live gauges (in-flight, RSS) from the aggregate
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(os.getpid())
+
+# ------------------ helpers (no-ops without prometheus_client) ------------------
+
+def _rss_bytes() -> int | None:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def observe_image(tiles: int, detections: int, seconds: float) -> None:
+    if ENABLED:
+        TILES.observe(tiles)
+        DETECTIONS.observe(detections)
+        IMAGE_SECONDS.observe(seconds)
+
+@contextmanager
+def in_flight() -> Iterator[None]:
+    if not ENABLED:
+        yield
+        return
+    IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        IN_FLIGHT.dec()
+
+def set_admitted(n: int) -> None:
+    if ENABLED:
+        QUEUE.set(n)
+
+def model_loaded(weights: str, backend: str, seconds: float) -> None:
+    if ENABLED:
+        MODEL_LOAD.set(seconds)
+        MODEL_INFO.labels(weights=str(weights), backend=backend).set(1)
+
+def exposition() -> tuple[bytes, str]:
+    """(body, content type) for /api/metrics; aggregates all workers in multiprocess mode."""
+    from prometheus_client import CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+    rss = _rss_bytes()
+    if rss is not None:
+        RSS.set(rss)
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Request count + latency per URL name (bounded label set); refreshes this worker's RSS."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        t0 = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - t0)
+        return response
+
+    async def __acall__(self, request):
+        t0 = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - t0)
+        return response
+
+    @staticmethod
+    def _record(request, response, seconds: float) -> None:
+        if not ENABLED:
+            return
+        match = getattr(request, "resolver_match", None)
+        endpoint = match.url_name if match and match.url_name else "other"
+        REQUESTS.labels(endpoint=endpoint, method=request.method, status=str(response.status_code)).inc()
+        LATENCY.labels(endpoint=endpoint).observe(seconds)
+        rss = _rss_bytes()
+        if rss is not None:
+            RSS.set(rss)
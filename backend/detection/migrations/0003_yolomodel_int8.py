@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-15 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("detection", "0002_detection_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="yolomodel",
+            name="fp32_latency_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="yolomodel",
+            name="int8_latency_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="yolomodel",
+            name="int8_map_5095_delta",
+            field=models.FloatField(
+                blank=True, help_text="INT8 - FP32 mAP@0.5:0.95", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="yolomodel",
+            name="int8_map_delta",
+            field=models.FloatField(
+                blank=True, help_text="INT8 - FP32 mAP@0.5", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="yolomodel",
+            name="int8_path",
+            field=models.CharField(
+                blank=True, help_text="Quantized .onnx (empty = none)", max_length=512
+            ),
+        ),
+        migrations.AddField(
+            model_name="yolomodel",
+            name="int8_report",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="yolomodel",
+            name="serve_int8",
+            field=models.BooleanField(
+                default=False,
+                help_text="Serve the INT8 variant while this model is active",
+            ),
+        ),
+    ]
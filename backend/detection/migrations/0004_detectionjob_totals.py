@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-15 05:04
+
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    # jobs created before the running totals: sum their finished items once
+    DetectionJob = apps.get_model("detection", "DetectionJob")
+    DetectionJobItem = apps.get_model("detection", "DetectionJobItem")
+    for job in DetectionJob.objects.all().iterator():
+        counts, total = {}, 0
+        for c, t in DetectionJobItem.objects.filter(job=job, status="done").values_list("counts", "total"):
+            for k, v in (c or {}).items():
+                counts[k] = counts.get(k, 0) + int(v)
+            total += t
+        if total or counts:
+            DetectionJob.objects.filter(pk=job.pk).update(counts=counts, total=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("detection", "0003_yolomodel_int8"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="detectionjob",
+            name="counts",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="detectionjob",
+            name="total",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -11,6 +11,14 @@ class YoloModel(models.Model):
     size = models.CharField(max_length=50, help_text="e.g. '23.1 MB'")
     weights_path = models.CharField(max_length=512, help_text="Absolute path to .pt/.onnx")
     is_active = models.BooleanField(default=False, db_index=True)
+    # INT8 variant (manage.py quantize_model): ONNX graph + deltas vs the FP32 graph
+    int8_path = models.CharField(max_length=512, blank=True, help_text="Quantized .onnx (empty = none)")
+    serve_int8 = models.BooleanField(default=False, help_text="Serve the INT8 variant while this model is active")
+    fp32_latency_ms = models.FloatField(null=True, blank=True)
+    int8_latency_ms = models.FloatField(null=True, blank=True)
+    int8_map_delta = models.FloatField(null=True, blank=True, help_text="INT8 - FP32 mAP@0.5")
+    int8_map_5095_delta = models.FloatField(null=True, blank=True, help_text="INT8 - FP32 mAP@0.5:0.95")
+    int8_report = models.JSONField(default=dict, blank=True)
 
     class Meta:
         ordering = ["-is_active", "-date_built", "name"]
@@ -23,3 +31,50 @@ class YoloModel(models.Model):
 
     def __str__(self):
         return f"{self.name} ({'ACTIVE' if self.is_active else 'inactive'})"
+
+
+class DetectionJob(models.Model):
+    QUEUED, RUNNING, DONE, CANCELLED = "queued", "running", "done", "cancelled"
+    STATUS_CHOICES = [(s, s) for s in (QUEUED, RUNNING, DONE, CANCELLED)]
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    params = models.JSONField(default=dict)                      # run_inference kwargs
+    input_dir = models.CharField(max_length=512)                 # uploaded images / zip on disk
+    num_items = models.PositiveIntegerField(default=0)
+    counts = models.JSONField(default=dict, blank=True)         # running collection counts over done items
+    total = models.PositiveIntegerField(default=0)              # running object total over done items
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"job {self.pk} ({self.status}, {self.num_items} images)"
+
+
+class DetectionJobItem(models.Model):
+    PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+    STATUS_CHOICES = [(s, s) for s in (PENDING, RUNNING, DONE, FAILED)]
+
+    job = models.ForeignKey(DetectionJob, on_delete=models.CASCADE, related_name="items")
+    index = models.PositiveIntegerField()
+    name = models.CharField(max_length=512)
+    source = models.CharField(max_length=512)                    # file path (image or zip)
+    member = models.CharField(max_length=512, blank=True)        # entry name when source is a zip
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    claimed_by = models.CharField(max_length=128, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    counts = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["job_id", "index"]
+        constraints = [models.UniqueConstraint(fields=["job", "index"], name="uniq_job_item_index")]
+        indexes = [models.Index(fields=["status", "job", "index"], name="job_item_queue_idx")]
+
+    def __str__(self):
+        return f"{self.job_id}#{self.index} {self.name} ({self.status})"
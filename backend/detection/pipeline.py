@@ -0,0 +1,204 @@
+# detection/pipeline.py
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Iterator, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+import threading, queue, time, logging
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _Stage:
+    """Busy-time accounting for one pipeline stage (summed over its workers)."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def timed(self, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                self.busy += dt
+                self.items += 1
+
+    def stats(self, wall: float) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_ms": int(self.busy * 1000),
+            "occupancy": round(self.busy / (wall * self.workers), 3) if wall > 0 else None,
+        }
+
+
+class BatchPipeline:
+    """
+    Three overlapping stages for a batch of images:
+      decode (thread pool) -> bounded queue -> model (calling thread) -> draw/encode/package (thread pool)
+    Decoded images waiting for the model, and images waiting to be encoded, are each bounded by
+    `depth`, so memory stays flat. Results are yielded in input order. OpenCV and torch release
+    the GIL, so the stages really overlap.
+    """
+
+    def __init__(self, decode_workers: int = 2, post_workers: int = 2, depth: int = 4):
+        self.decode_workers = max(1, int(decode_workers))
+        self.post_workers = max(1, int(post_workers))
+        self.depth = max(1, int(depth))
+        self.stages = {
+            "decode": _Stage("decode", self.decode_workers),
+            "model": _Stage("model", 1),
+            "post": _Stage("post", self.post_workers),
+        }
+        self.wall = 0.0
+
+    def run(self, named_inputs: Iterable[Tuple[str, Any]], params: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any] | None, str | None]]:
+        from .detector import (_load_model, _resolve_device, _read_bytes, _bgr_from_file, _detect,
+                               _draw_rects_bgr, _package, _cache_key, _cache_get, _cached, _with_timings,
+                               _tiles_inferred)
+        from .timing import StageTimer
+        from .metrics import in_flight, observe_image
+        from .cache import result_cache
+        from .executors import InputError
+
+        params = dict(params)
+        annotate = bool(params.pop("annotate", False))
+        render = {k: params.pop(k) for k in ("image_format", "image_url", "max_dim") if k in params}
+        timings = bool(params.pop("timings", False))
+        model = _load_model()
+        dev = _resolve_device(params.pop("device", None))
+        dec, mdl, post = self.stages["decode"], self.stages["model"], self.stages["post"]
+        cache = result_cache()
+
+        def _decode(f):
+            # -> (cache key, cached payload or None, image or None, timer)
+            if isinstance(f, InputError):
+                raise f
+            timer = StageTimer()
+            with timer.stage("read"):
+                data = _read_bytes(f)
+            key = hit = None
+            if cache is not None:
+                with timer.stage("cache"):
+                    key = _cache_key(data, annotate=annotate, **params, **render)
+                    hit = _cache_get(cache, key)
+            if hit is not None:
+                return key, hit, None, timer
+            with timer.stage("decode"):
+                return key, None, _bgr_from_file(data), timer
+
+        def _post(name, key, img, dets, extra, t_ms, timer):
+            H, W = img.shape[:2]
+            annotated = None
+            if annotate:
+                with timer.stage("draw"):
+                    annotated = _draw_rects_bgr(img, dets)
+            res = _package(dets, W, H, t_ms, annotated, extra, **render, timer=timer)
+            if cache is not None:
+                cache.put(key, res)
+            stage_ms = timer.log(name)
+            observe_image(_tiles_inferred(extra), res["total"], stage_ms["total_ms"] / 1000)
+            return _with_timings(res, stage_ms, timings)
+
+        decoded: "queue.Queue" = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        t_start = time.perf_counter()
+
+        with ThreadPoolExecutor(self.decode_workers, thread_name_prefix="pipe-decode") as dpool, \
+             ThreadPoolExecutor(self.post_workers, thread_name_prefix="pipe-post") as ppool:
+
+            feed_error: "list[Exception]" = []
+
+            def _feed():
+                # submit decodes in order; the bounded queue throttles how far ahead we read
+                try:
+                    for name, f in named_inputs:
+                        if stop.is_set():
+                            break
+                        decoded.put((name, dpool.submit(dec.timed, _decode, f)))
+                except Exception as e:
+                    feed_error.append(e)  # raised by the consumer once the items before it are out
+                finally:
+                    decoded.put(_DONE)
+
+            feeder = threading.Thread(target=_feed, name="pipe-feed", daemon=True)
+            feeder.start()
+            inflight: "deque[Tuple[str, Future | None, str | None]]" = deque()
+
+            def _drain(keep: int):
+                # yield finished results in input order; block on the oldest while more than `keep` are pending
+                while inflight:
+                    name, fut, err = inflight[0]
+                    if fut is not None and not fut.done() and len(inflight) <= keep:
+                        break
+                    inflight.popleft()
+                    if fut is None:
+                        yield name, None, err
+                        continue
+                    try:
+                        yield name, fut.result(), None
+                    except Exception as e:
+                        yield name, None, str(e)
+
+            try:
+                while True:
+                    entry = decoded.get()
+                    if entry is _DONE:
+                        break
+                    name, dfut = entry
+                    try:
+                        key, hit, img, timer = dfut.result()
+                        if hit is not None:
+                            done: Future = Future()
+                            done.set_result(_with_timings(_cached(hit, timer.t0), timer.log(f"{name} cache hit"), timings))
+                            inflight.append((name, done, None))
+                            yield from _drain(keep=self.depth)
+                            continue
+                        t0 = time.perf_counter()
+                        with in_flight():
+                            dets, extra = mdl.timed(_detect, model, img, dev=dev, timer=timer, **params)
+                        t_ms = int((time.perf_counter() - t0) * 1000)
+                    except Exception as e:
+                        inflight.append((name, None, str(e)))
+                    else:
+                        inflight.append((name, ppool.submit(post.timed, _post, name, key, img, dets, extra, t_ms, timer), None))
+                        del img
+                    yield from _drain(keep=self.depth)
+                yield from _drain(keep=0)
+                if feed_error:
+                    raise feed_error[0]
+            finally:
+                stop.set()
+                # unblock the feeder if the consumer stopped early
+                while feeder.is_alive():
+                    try:
+                        decoded.get_nowait()
+                    except queue.Empty:
+                        feeder.join(timeout=0.01)
+                self.wall = time.perf_counter() - t_start
+                log.debug("Batch pipeline: %s", self.stats())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "wall_ms": int(self.wall * 1000),
+            "stages": {name: st.stats(self.wall) for name, st in self.stages.items()},
+        }
+
+
+def batch_pipeline() -> BatchPipeline | None:
+    """A fresh pipeline per batch when settings.YOLO_BATCH_PIPELINE is on, else None."""
+    if not getattr(settings, "YOLO_BATCH_PIPELINE", False):
+        return None
+    return BatchPipeline(
+        decode_workers=getattr(settings, "YOLO_PIPELINE_DECODE_WORKERS", 2),
+        post_workers=getattr(settings, "YOLO_PIPELINE_POST_WORKERS", 2),
+        depth=getattr(settings, "YOLO_PIPELINE_DEPTH", 4),
+    )
@@ -0,0 +1,128 @@
+# detection/pool.py
+from __future__ import annotations
+from typing import Any, Dict, Iterator, List
+from collections import deque
+from contextlib import contextmanager
+import threading, time, logging
+import numpy as np
+
+from .executors import Overloaded
+
+log = logging.getLogger(__name__)
+
+# N independent model replicas per process. An Ultralytics predictor keeps per-call state
+# (dataset, batch, results), so two threads must never predict on the same instance: every
+# forward pass checks a replica out and back in. Replicas run in parallel, each on torch's
+# process-wide intra-op thread pool, so size the pool together with YOLO_TORCH_THREADS.
+
+class PoolTimeout(Overloaded):
+    """No model replica became free within the checkout timeout."""
+
+
+class ModelPool:
+    def __init__(self, replicas: List[Any], timeout_s: float = 30.0, window: int = 2048):
+        if not replicas:
+            raise ValueError("ModelPool needs at least one replica")
+        self.replicas = list(replicas)
+        self.timeout_s = float(timeout_s)
+        self._window = window
+        self._reset()
+
+    def _reset(self) -> None:
+        self._cond = threading.Condition()
+        self._idle: deque = deque(self.replicas)
+        self._since: Dict[int, float] = {}              # id(replica) -> checkout time
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self._t0 = time.perf_counter()
+        self._busy_s = 0.0                              # completed checkout time, all replicas
+        self._checkouts = self._timeouts = self._waited = self._peak = 0
+        self._wait_ms: deque = deque(maxlen=self._window)
+        self._hold_ms: deque = deque(maxlen=self._window)
+
+    def after_fork(self) -> None:
+        """In a forked child: fresh lock, every replica idle (the parent's threads did not come along)."""
+        self._reset()
+
+    def reset_stats(self) -> None:
+        """Start a new measurement window (utilization, counters, wait/hold percentiles)."""
+        with self._cond:
+            self._reset_stats()
+            now = self._t0
+            for k in self._since:
+                self._since[k] = now  # only count in-flight checkouts from here on
+
+    @property
+    def size(self) -> int:
+        return len(self.replicas)
+
+    def checkout(self, timeout: float | None = None) -> Any:
+        """Take an idle replica, waiting up to `timeout` (default: the pool's); raises PoolTimeout."""
+        timeout = self.timeout_s if timeout is None else float(timeout)
+        t = time.perf_counter()
+        with self._cond:
+            if not self._idle:
+                self._waited += 1
+                if not self._cond.wait_for(lambda: self._idle, timeout=timeout if timeout > 0 else None):
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No model replica free after {timeout:g}s ({self.size} in use)")
+            model = self._idle.popleft()
+            now = time.perf_counter()
+            self._since[id(model)] = now
+            self._checkouts += 1
+            self._peak = max(self._peak, self.size - len(self._idle))
+            self._wait_ms.append((now - t) * 1000)
+        return model
+
+    def checkin(self, model: Any) -> None:
+        with self._cond:
+            t = self._since.pop(id(model), None)
+            if t is None:
+                raise ValueError("Replica was not checked out from this pool")
+            held = time.perf_counter() - t
+            self._busy_s += held
+            self._hold_ms.append(held * 1000)
+            self._idle.append(model)
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout: float | None = None) -> Iterator[Any]:
+        model = self.checkout(timeout)
+        try:
+            yield model
+        finally:
+            self.checkin(model)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.perf_counter()
+            in_use = self.size - len(self._idle)
+            busy = self._busy_s + sum(now - t for t in self._since.values())
+            elapsed = now - self._t0
+            wait = np.asarray(self._wait_ms, dtype=np.float64)
+            hold = np.asarray(self._hold_ms, dtype=np.float64)
+            out = {
+                "size": self.size, "in_use": in_use, "idle": len(self._idle), "peak_in_use": self._peak,
+                "checkouts": self._checkouts, "waited": self._waited, "timeouts": self._timeouts,
+                "timeout_s": self.timeout_s,
+            }
+        pct = lambda a, q: round(float(np.percentile(a, q)), 2) if a.size else None
+        out.update({
+            # share of replica-time spent checked out since creation (or reset_stats())
+            "utilization": round(busy / (self.size * elapsed), 4) if elapsed > 0 else None,
+            "wait_ms": {"p50": pct(wait, 50), "p95": pct(wait, 95), "max": pct(wait, 100)},
+            "hold_ms": {"p50": pct(hold, 50), "p95": pct(hold, 95)},
+            "window": int(hold.size),
+        })
+        return out
+
+
+@contextmanager
+def leased(model: Any) -> Iterator[Any]:
+    """A replica from `model` if it is a ModelPool, else `model` itself."""
+    if isinstance(model, ModelPool):
+        with model.lease() as m:
+            yield m
+    else:
+        yield model
@@ -0,0 +1,190 @@
+# detection/quantize.py
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from pathlib import Path
+import os, re, time, tempfile, logging
+import numpy as np
+
+from .backends import OnnxYolo, preprocess, weights_digest, _cache_dir
+from .detector import _bgr_from_file, _boxes_from_result, _iou_xyxy
+
+log = logging.getLogger(__name__)
+
+# INT8 variant of a registered model: ONNX Runtime static quantization (QDQ, per-channel int8
+# weights, uint8 activations) calibrated on local images, then checked against the FP32 ONNX
+# graph for latency and mAP. Used by `manage.py quantize_model`.
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+def list_images(folder: str | os.PathLike, limit: int = 0) -> List[Path]:
+    paths = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_EXTS)
+    return paths[:limit] if limit > 0 else paths
+
+def _read(path: Path) -> np.ndarray:
+    return _bgr_from_file(path.read_bytes())
+
+# ------------------ quantization ------------------
+
+def _calibration_reader(paths: Sequence[Path], input_name: str, imgsz: int):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class _Reader(CalibrationDataReader):
+        """One letterboxed image per get_next(), preprocessed exactly as OnnxYolo.predict does."""
+        def __init__(self):
+            self._it = iter(paths)
+
+        def get_next(self):
+            p = next(self._it, None)
+            if p is None:
+                return None
+            return {input_name: preprocess([_read(p)], imgsz)[0]}
+
+    return _Reader()
+
+def _head_nodes(model) -> List[str]:
+    """Nodes of the last model block (detect head: box decode, DFL, concat); kept in float."""
+    blocks = [(int(m.group(1)), n.name) for n in model.graph.node
+              for m in [re.match(r"^/model\.(\d+)/", n.name or "")] if m]
+    if not blocks:
+        return []
+    last = max(b for b, _ in blocks)
+    return [name for b, name in blocks if b == last]
+
+def int8_path_for(fp32_onnx: str) -> Path:
+    src = Path(fp32_onnx)
+    return _cache_dir() / f"{src.stem}-{weights_digest(src)[:16]}-int8.onnx"
+
+def quantize_onnx(fp32_onnx: str, calib: Sequence[Path], imgsz: int = 640,
+                  exclude_head: bool = True, out: str | os.PathLike | None = None) -> str:
+    """Static INT8 quantization of an exported YOLO ONNX graph; returns the .onnx path."""
+    try:
+        import onnx
+        import onnxruntime as ort
+        from onnxruntime.quantization import quantize_static, QuantFormat, QuantType, CalibrationMethod
+    except ImportError as e:
+        raise RuntimeError("INT8 quantization requires the 'onnx' and 'onnxruntime' packages") from e
+    if not calib:
+        raise ValueError("No calibration images")
+    target = Path(out) if out else int8_path_for(fp32_onnx)
+    input_name = ort.InferenceSession(fp32_onnx, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    with tempfile.TemporaryDirectory(dir=target.parent) as tmp:
+        src = Path(tmp) / "pre.onnx"
+        try:
+            # shape inference + graph cleanup, as ORT recommends before quantizing
+            from onnxruntime.quantization.shape_inference import quant_pre_process
+            quant_pre_process(fp32_onnx, str(src), skip_symbolic_shape=True)
+        except Exception:
+            log.warning("quant_pre_process failed; quantizing the exported graph as is", exc_info=True)
+            src = Path(fp32_onnx)
+        exclude = _head_nodes(onnx.load(str(src))) if exclude_head else []
+        tmp_out = Path(tmp) / "int8.onnx"
+        quantize_static(
+            str(src), str(tmp_out), _calibration_reader(calib, input_name, imgsz),
+            quant_format=QuantFormat.QDQ, per_channel=True,
+            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax, nodes_to_exclude=exclude,
+        )
+        os.replace(tmp_out, target)
+    log.info("Quantized %s -> %s (%d calibration images, %d head nodes kept in float)",
+             fp32_onnx, target, len(calib), len(exclude))
+    return str(target)
+
+# ------------------ validation ------------------
+
+def yolo_labels(img_path: Path, W: int, H: int) -> List[Dict[str, Any]] | None:
+    """
+    Ground truth in YOLO txt format ("cls cx cy w h", normalized) from <stem>.txt next to the image
+    or in a sibling labels/ folder (images/x.jpg -> labels/x.txt). None when there is no file.
+    """
+    candidates = [img_path.with_suffix(".txt"), img_path.parent.parent / "labels" / f"{img_path.stem}.txt"]
+    for c in candidates:
+        if c.is_file():
+            gts = []
+            for line in c.read_text().splitlines():
+                parts = line.split()
+                if len(parts) < 5:
+                    continue
+                cls, cx, cy, w, h = int(float(parts[0])), *(float(v) for v in parts[1:5])
+                gts.append({"class_name": str(cls), "confidence": 1.0,
+                            "bbox": ((cx - w / 2) * W, (cy - h / 2) * H, (cx + w / 2) * W, (cy + h / 2) * H)})
+            return gts
+    return None
+
+def average_precision(preds: Sequence[List[Dict[str, Any]]], gts: Sequence[List[Dict[str, Any]]],
+                      iou_th: float = 0.5) -> float:
+    """Mean over classes of COCO-style (101-point interpolated) AP at one IoU threshold."""
+    classes = {d["class_name"] for g in gts for d in g}
+    aps = []
+    for c in sorted(classes):
+        n_gt = sum(1 for g in gts for d in g if d["class_name"] == c)
+        scored = sorted(((d["confidence"], i, d["bbox"]) for i, p in enumerate(preds) for d in p
+                         if d["class_name"] == c), key=lambda t: -t[0])
+        used = [np.zeros(len(g), dtype=bool) for g in gts]
+        tp = np.zeros(len(scored))
+        for k, (_, i, box) in enumerate(scored):
+            best, best_j = iou_th, -1
+            for j, g in enumerate(gts[i]):
+                if g["class_name"] == c and not used[i][j]:
+                    iou = _iou_xyxy(box, g["bbox"])
+                    if iou >= best:
+                        best, best_j = iou, j
+            if best_j >= 0:
+                used[i][best_j] = True
+                tp[k] = 1
+        ctp = np.cumsum(tp)
+        recall = ctp / n_gt
+        precision = ctp / np.arange(1, len(scored) + 1)
+        # precision envelope, sampled at recall 0, 0.01, ..., 1
+        precision = np.maximum.accumulate(precision[::-1])[::-1] if len(scored) else precision
+        grid = np.linspace(0, 1, 101)
+        idx = np.searchsorted(recall, grid, side="left")
+        aps.append(float(np.mean([precision[i] if i < len(precision) else 0.0 for i in idx])))
+    return float(np.mean(aps)) if aps else 0.0
+
+def map_scores(preds, gts) -> Dict[str, float]:
+    return {
+        "map50": average_precision(preds, gts, 0.5),
+        "map50_95": float(np.mean([average_precision(preds, gts, t) for t in np.arange(0.5, 0.96, 0.05)])),
+    }
+
+def run_model(model, imgs: Iterable[np.ndarray], imgsz: int, conf: float = 0.001,
+              repeat: int = 3) -> Tuple[List[List[Dict[str, Any]]], float]:
+    """Detections per image (at a low conf, for AP) and the median single-image latency in ms."""
+    preds, times = [], []
+    for k, img in enumerate(imgs):
+        if k == 0:
+            model.predict(source=img, conf=conf, imgsz=imgsz, verbose=False)  # warm-up
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            r = model.predict(source=img, conf=conf, imgsz=imgsz, verbose=False)[0]
+            times.append((time.perf_counter() - t0) * 1000)
+        preds.append(_boxes_from_result(r))
+    return preds, float(np.median(times)) if times else 0.0
+
+def compare(fp32_onnx: str, int8_onnx: str, val: Sequence[Path], imgsz: int = 640,
+            repeat: int = 3, label_conf: float = 0.25) -> Dict[str, Any]:
+    """
+    Latency and mAP of the INT8 graph vs the FP32 one on the validation images. With YOLO
+    labels for every image the mAP is against ground truth; otherwise the FP32 detections
+    (conf >= label_conf) are the reference, so FP32 scores ~1.0 and the delta measures agreement.
+    """
+    imgs = [_read(p) for p in val]
+    fp32, int8 = OnnxYolo(fp32_onnx), OnnxYolo(int8_onnx)
+    p32, ms32 = run_model(fp32, imgs, imgsz, repeat=repeat)
+    p8, ms8 = run_model(int8, imgs, imgsz, repeat=repeat)
+    labels = [yolo_labels(p, im.shape[1], im.shape[0]) for p, im in zip(val, imgs)]
+    if labels and all(g is not None for g in labels):
+        ref, source = labels, "labels"
+    else:
+        ref, source = [[d for d in p if d["confidence"] >= label_conf] for p in p32], "fp32"
+    m32, m8 = map_scores(p32, ref), map_scores(p8, ref)
+    return {
+        "images": len(imgs), "imgsz": imgsz, "reference": source,
+        "fp32_latency_ms": round(ms32, 2), "int8_latency_ms": round(ms8, 2),
+        "speedup": round(ms32 / ms8, 3) if ms8 else None,
+        "fp32_map50": round(m32["map50"], 4), "int8_map50": round(m8["map50"], 4),
+        "fp32_map50_95": round(m32["map50_95"], 4), "int8_map50_95": round(m8["map50_95"], 4),
+        "map50_delta": round(m8["map50"] - m32["map50"], 4),
+        "map50_95_delta": round(m8["map50_95"] - m32["map50_95"], 4),
+    }
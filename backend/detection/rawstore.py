@@ -0,0 +1,66 @@
+# detection/rawstore.py
+from __future__ import annotations
+from typing import Any, Dict, List
+from pathlib import Path
+import json, os, re, time, uuid, logging
+import numpy as np
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"^[0-9a-f]{32}$")
+_LAST_SWEEP = 0.0
+
+# Pre-NMS detections per image on disk (one .npz per token), so any uvicorn worker can
+# re-threshold a result produced by another one.
+
+def _store_dir() -> Path:
+    d = Path(getattr(settings, "YOLO_RAW_STORE_DIR", Path(settings.BASE_DIR) / "raw"))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+def _ttl() -> float:
+    return float(getattr(settings, "YOLO_RAW_STORE_TTL_S", 3600))
+
+def _sweep(d: Path) -> None:
+    """Delete expired entries; runs at most once a minute per process."""
+    global _LAST_SWEEP
+    now = time.time()
+    if now - _LAST_SWEEP < 60:
+        return
+    _LAST_SWEEP = now
+    for p in d.glob("*.npz"):
+        try:
+            if now - p.stat().st_mtime > _ttl():
+                p.unlink()
+        except OSError:
+            pass  # removed by another worker
+
+def save_raw(dets: List[Dict[str, Any]], W: int, H: int, floor_conf: float, extra: Dict[str, Any] | None = None) -> str:
+    """Store the raw detections of one image; returns the result token."""
+    d = _store_dir()
+    _sweep(d)
+    token = uuid.uuid4().hex
+    boxes = np.array([x["bbox"] for x in dets], dtype=np.float64).reshape(-1, 4)
+    scores = np.array([x["confidence"] for x in dets], dtype=np.float64)
+    classes = np.array([x["class_name"] for x in dets], dtype=np.str_)
+    meta = {"width": W, "height": H, "floor_conf": floor_conf, "extra": extra or {}}
+    tmp = d / f"{token}.tmp.npz"
+    np.savez(tmp, boxes=boxes, scores=scores, classes=classes, meta=np.array(json.dumps(meta)))
+    os.replace(tmp, d / f"{token}.npz")
+    return token
+
+def load_raw(token: str) -> Dict[str, Any] | None:
+    """{boxes, scores, classes, width, height, floor_conf, extra} or None if unknown/expired."""
+    if not _TOKEN_RE.match(token or ""):
+        return None
+    p = _store_dir() / f"{token}.npz"
+    try:
+        if time.time() - p.stat().st_mtime > _ttl():
+            return None
+        with np.load(p, allow_pickle=False) as z:
+            out = {"boxes": z["boxes"], "scores": z["scores"], "classes": z["classes"]}
+            out.update(json.loads(str(z["meta"])))
+    except (OSError, ValueError, KeyError):
+        return None
+    return out
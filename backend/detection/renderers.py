@@ -0,0 +1,111 @@
+# detection/renderers.py
+from __future__ import annotations
+from typing import Any, Dict, List
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer, BrowsableAPIRenderer
+
+# Compact (struct-of-arrays) detection payloads, negotiated per request with
+#   Accept: application/vnd.yolo.compact+json | application/x-msgpack   or   ?format=compact|msgpack
+# The default application/json payload is unchanged.
+
+def _quant(request) -> float:
+    try:
+        return max(0.0, float(request.query_params.get("quant", 0))) if request is not None else 0.0
+    except (AttributeError, ValueError):
+        return 0.0
+
+def compact_detections(dets: List[Dict[str, Any]], quant: float = 0.0, binary: bool = False) -> Dict[str, Any]:
+    """
+    Standard detection dicts -> parallel arrays:
+      class_names (lookup table), class_ids (index into it), confidences, boxes (flat x1,y1,x2,y2).
+    quant > 0 stores boxes as integers in units of `quant` pixels (box_scale). With binary=True
+    (MessagePack) confidences and boxes are little-endian raw bytes; see conf_dtype / box_dtype.
+    """
+    names: Dict[str, int] = {}
+    ids = [names.setdefault(d["class_name"], len(names)) for d in dets]
+    conf = np.fromiter((d["confidence"] for d in dets), dtype=np.float32, count=len(dets))
+    boxes = np.empty((len(dets), 4), dtype=np.float32)
+    for i, d in enumerate(dets):
+        b = d["bbox"]
+        boxes[i] = (b["x1"], b["y1"], b["x2"], b["y2"])
+    boxes = boxes.ravel()
+
+    out: Dict[str, Any] = {"count": len(dets), "class_names": list(names), "class_ids": ids}
+    if quant > 0:
+        q = np.rint(boxes / quant)
+        boxes = q.astype(np.uint16 if q.size == 0 or (q.min() >= 0 and q.max() < 65536) else np.int32)
+        out["box_scale"] = quant
+    if binary:
+        out["confidences"] = conf.astype("<f4").tobytes()
+        out["conf_dtype"] = "<f4"
+        out["boxes"] = boxes.astype(boxes.dtype.newbyteorder("<")).tobytes()
+        out["box_dtype"] = boxes.dtype.newbyteorder("<").str
+    else:
+        out["confidences"] = np.round(conf.astype(np.float64), 4).tolist()
+        out["boxes"] = boxes.tolist() if quant > 0 else np.round(boxes.astype(np.float64), 2).tolist()
+    return out
+
+def to_compact(data: Any, quant: float = 0.0, binary: bool = False) -> Any:
+    """Rewrite `detections` of a single-image payload, or of each batch/job item, in compact form."""
+    if not isinstance(data, dict):
+        return data
+    out = dict(data)
+    if isinstance(out.get("detections"), list):
+        out["detections"] = compact_detections(out["detections"], quant, binary)
+        out["format"] = "compact"
+    if isinstance(out.get("items"), list):
+        out["items"] = [to_compact(it, quant, binary) for it in out["items"]]
+    return out
+
+
+class CompactJSONRenderer(JSONRenderer):
+    media_type = "application/vnd.yolo.compact+json"
+    format = "compact"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        request = (renderer_context or {}).get("request")
+        return super().render(to_compact(data, _quant(request)), accepted_media_type, renderer_context)
+
+
+class MsgPackRenderer(BaseRenderer):
+    media_type = "application/x-msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        import msgpack
+        request = (renderer_context or {}).get("request")
+        return msgpack.packb(to_compact(data, _quant(request), binary=True), default=str, use_bin_type=True)
+
+
+try:
+    import msgpack  # noqa: F401
+    _HAS_MSGPACK = True
+except ImportError:
+    _HAS_MSGPACK = False
+
+# renderer_classes for the detection views (first = default)
+DETECTION_RENDERERS = [JSONRenderer, BrowsableAPIRenderer, CompactJSONRenderer] + ([MsgPackRenderer] if _HAS_MSGPACK else [])
+
+
+def negotiated(request, data, status=200):
+    """
+    Plain-Django (async) views: the same negotiation as DETECTION_RENDERERS on ?format= / Accept.
+    Returns an HttpResponse, or None for the default JSON payload (caller uses JsonResponse).
+    """
+    from django.http import HttpResponse
+    fmt = request.GET.get("format")
+    accept = request.headers.get("Accept", "")
+    for cls in DETECTION_RENDERERS[2:]:
+        if fmt == cls.format or (fmt is None and cls.media_type in accept):
+            r = cls()
+            body = r.render(data, cls.media_type, {"request": _QueryParams(request)})
+            return HttpResponse(body, content_type=cls.media_type, status=status)
+    return None
+
+
+class _QueryParams:
+    """Just enough of a DRF Request for _quant()."""
+    def __init__(self, request):
+        self.query_params = request.GET
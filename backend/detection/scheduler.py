@@ -0,0 +1,148 @@
+# detection/scheduler.py
+from __future__ import annotations
+from typing import List, Dict, Any, Tuple
+from collections import deque
+from concurrent.futures import Future
+import threading, queue, time, logging
+import numpy as np
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+
+class _Item:
+    __slots__ = ("img", "key", "future", "t_enq")
+
+    def __init__(self, img: np.ndarray, key: Tuple[Any, ...]):
+        self.img = img
+        self.key = key
+        self.future: Future = Future()
+        self.t_enq = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    In-process dynamic batching across requests. Callers enqueue images (whole images or tiles);
+    one worker thread forms batches of up to max_batch items, waiting at most max_wait_ms after
+    the oldest queued item, and runs one forward pass per (conf, imgsz, device) group.
+    """
+
+    def __init__(self, model, max_batch: int = 8, max_wait_ms: float = 5.0, window: int = 2048):
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._q: "queue.Queue[_Item]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._lat_ms: deque = deque(maxlen=window)      # enqueue -> result, per item
+        self._wait_ms: deque = deque(maxlen=window)     # enqueue -> batch start, per item
+        self._done_at: deque = deque(maxlen=window)     # completion timestamps
+        self._batch_sizes: deque = deque(maxlen=window)
+        self._items = 0
+        self._batches = 0
+        self._errors = 0
+        self._thread = threading.Thread(target=self._loop, name="yolo-microbatch", daemon=True)
+        self._thread.start()
+
+    # ---------- caller side ----------
+
+    def predict(self, imgs: List[np.ndarray], conf: float, imgsz: int, device: str) -> List[Any]:
+        """Blocking: one result per image, in order. Images may be batched with other callers'."""
+        key = (float(conf), int(imgsz), str(device))
+        items = [_Item(im, key) for im in imgs]
+        for it in items:
+            self._q.put(it)
+        return [it.future.result() for it in items]
+
+    # ---------- worker side ----------
+
+    def _collect(self) -> List[_Item]:
+        first = self._q.get()
+        batch = [first]
+        deadline = first.t_enq + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, items: List[_Item]) -> None:
+        from .detector import _predict_batch
+        conf, imgsz, device = items[0].key
+        t_start = time.perf_counter()
+        try:
+            results = _predict_batch(self.model, [it.img for it in items], conf=conf, imgsz=imgsz, device=device)
+        except Exception as e:
+            log.exception("Micro-batch of %d failed", len(items))
+            with self._lock:
+                self._errors += len(items)
+            for it in items:
+                it.future.set_exception(e)
+            return
+        t_end = time.perf_counter()
+        with self._lock:
+            self._items += len(items)
+            self._batches += 1
+            self._batch_sizes.append(len(items))
+            for it in items:
+                self._wait_ms.append((t_start - it.t_enq) * 1000)
+                self._lat_ms.append((t_end - it.t_enq) * 1000)
+                self._done_at.append(t_end)
+        for it, r in zip(items, results):
+            it.future.set_result(r)
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            groups: Dict[Tuple[Any, ...], List[_Item]] = {}
+            for it in batch:
+                groups.setdefault(it.key, []).append(it)
+            for items in groups.values():
+                self._run(items)
+
+    # ---------- stats ----------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lat = np.asarray(self._lat_ms, dtype=np.float64)
+            wait = np.asarray(self._wait_ms, dtype=np.float64)
+            done = np.asarray(self._done_at, dtype=np.float64)
+            sizes = np.asarray(self._batch_sizes, dtype=np.float64)
+            out = {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "queued": self._q.qsize(),
+                "items": self._items,
+                "batches": self._batches,
+                "errors": self._errors,
+            }
+        pct = lambda a, q: round(float(np.percentile(a, q)), 2) if a.size else None
+        span = float(done[-1] - done[0]) if done.size > 1 else 0.0
+        out.update({
+            "mean_batch": round(float(sizes.mean()), 2) if sizes.size else None,
+            "latency_ms": {"p50": pct(lat, 50), "p95": pct(lat, 95), "max": pct(lat, 100)},
+            "queue_wait_ms": {"p50": pct(wait, 50), "p95": pct(wait, 95)},
+            "throughput_per_s": round((done.size - 1) / span, 2) if span > 0 else None,
+            "window": int(lat.size),
+        })
+        return out
+
+
+_SCHEDULER: MicroBatcher | None = None
+_SCHEDULER_LOCK = threading.Lock()
+
+def get_scheduler(model=None) -> MicroBatcher | None:
+    """Process-wide batcher when settings.YOLO_MICROBATCH is on (created on first use), else None."""
+    global _SCHEDULER
+    if not getattr(settings, "YOLO_MICROBATCH", False):
+        return None
+    if _SCHEDULER is None and model is not None:
+        with _SCHEDULER_LOCK:
+            if _SCHEDULER is None:
+                _SCHEDULER = MicroBatcher(
+                    model,
+                    max_batch=getattr(settings, "YOLO_MICROBATCH_MAX_BATCH", 8),
+                    max_wait_ms=getattr(settings, "YOLO_MICROBATCH_MAX_WAIT_MS", 5.0),
+                )
+    return _SCHEDULER
@@ -0,0 +1,96 @@
+# detection/tiling.py
+from __future__ import annotations
+from functools import lru_cache
+from typing import NamedTuple, Tuple, List
+import numpy as np
+import cv2
+
+PAD_VALUE = (114, 114, 114)  # Ultralytics letterbox gray
+
+class TilePlan(NamedTuple):
+    tiles: Tuple[Tuple[int, int, int, int], ...]   # (left, top, right, bottom), row-major
+    tile_size: int
+    grid_tiles: int                                 # tiles the plain range(0, L, step) grid would use
+
+    @property
+    def saved(self) -> int:
+        return self.grid_tiles - len(self.tiles)
+
+def _starts(length: int, tile_size: int, step: int, align_edges: bool) -> List[int]:
+    if not align_edges:
+        return list(range(0, length, step))
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)  # last tile flush with the edge, no sliver
+    return starts
+
+@lru_cache(maxsize=256)
+def plan_tiles(W: int, H: int, tile_size: int, overlap: float, align_edges: bool = True) -> TilePlan:
+    """
+    Tile layout for a WxH image. With align_edges the last row/column is shifted back so it
+    ends on the image edge (full-size tiles, larger overlap) instead of leaving thin slivers.
+    Cached per (W, H, tile_size, overlap, align_edges).
+    """
+    step = max(1, int(tile_size * (1.0 - overlap)))
+    tiles = tuple(
+        (left, top, min(left + tile_size, W), min(top + tile_size, H))
+        for top in _starts(H, tile_size, step, align_edges)
+        for left in _starts(W, tile_size, step, align_edges)
+    )
+    grid = len(range(0, W, step)) * len(range(0, H, step))
+    return TilePlan(tiles=tiles, tile_size=tile_size, grid_tiles=grid)
+
+def pad_tile(tile: np.ndarray, tile_size: int) -> np.ndarray:
+    """Pad a short edge tile at the bottom/right to tile_size x tile_size (coordinates unchanged)."""
+    h, w = tile.shape[:2]
+    if h >= tile_size and w >= tile_size:
+        return tile
+    return cv2.copyMakeBorder(tile, 0, max(0, tile_size - h), 0, max(0, tile_size - w),
+                              cv2.BORDER_CONSTANT, value=PAD_VALUE)
+
+# ------------------ empty-tile pre-screen ------------------
+
+SCREEN_METHODS = ("std", "edges")
+SCREEN_OFF = ("", "0", "off", "none")
+SCREEN_THRESHOLDS = {"std": 4.0, "edges": 0.0005}  # gray levels / edge-pixel fraction
+
+def _activity_map(img: np.ndarray, method: str, scale: int) -> np.ndarray:
+    """Integral image of the per-pixel activity on a 1/scale grayscale copy (float64, (h+1, w+1))."""
+    H, W = img.shape[:2]
+    small = cv2.resize(img, (max(1, W // scale), max(1, H // scale)), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    if method == "edges":
+        return cv2.integral((cv2.Canny(gray, 50, 150) > 0).astype(np.uint8), sdepth=cv2.CV_64F)
+    s, sq = cv2.integral2(gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    return np.stack([s, sq], axis=-1)
+
+def tile_activity(img: np.ndarray, tiles, method: str = "std", scale: int = 8) -> np.ndarray:
+    """
+    Cheap per-tile content score from one downsampled pass over the image:
+      std   - gray-level standard deviation inside the tile
+      edges - fraction of Canny edge pixels inside the tile
+    """
+    if method not in SCREEN_METHODS:
+        raise ValueError(f"Unknown tile screen {method!r} (expected one of {SCREEN_METHODS})")
+    scale = max(1, int(scale))
+    integ = _activity_map(img, method, scale)
+    h, w = integ.shape[0] - 1, integ.shape[1] - 1
+    t = np.asarray(tiles, dtype=np.int64).reshape(-1, 4)
+    l = np.clip(t[:, 0] // scale, 0, w - 1)
+    tp = np.clip(t[:, 1] // scale, 0, h - 1)
+    r = np.clip(np.maximum(-(-t[:, 2] // scale), l + 1), 1, w)
+    b = np.clip(np.maximum(-(-t[:, 3] // scale), tp + 1), 1, h)
+    area = ((r - l) * (b - tp)).astype(np.float64)
+    box = integ[b, r] - integ[tp, r] - integ[b, l] + integ[tp, l]
+    if method == "edges":
+        return box / area
+    mean = box[:, 0] / area
+    return np.sqrt(np.maximum(box[:, 1] / area - mean * mean, 0.0))
+
+def screen_tiles(img: np.ndarray, tiles, method: str = "std", threshold: float | None = None,
+                 scale: int = 8) -> np.ndarray:
+    """Boolean keep-mask over `tiles`: False for tiles too uniform to contain objects."""
+    if threshold is None:
+        threshold = SCREEN_THRESHOLDS[method]
+    return tile_activity(img, tiles, method, scale) >= threshold
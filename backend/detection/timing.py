@@ -0,0 +1,83 @@
+# detection/timing.py
+from __future__ import annotations
+from typing import Any, Dict, List
+from contextlib import contextmanager
+import time, logging
+
+log = logging.getLogger("detection.timing")
+
+# Stage names in pipeline order (also the Server-Timing metric names)
+STAGES = ("read", "decode", "cache", "tiling", "screen", "forward", "boxes", "nms", "draw", "encode", "package", "serialize")
+
+
+class StageTimer:
+    """perf_counter() accumulator for the stages of one image (one instance per request/item)."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.ms: Dict[str, float] = {}
+        self.forward_calls: List[float] = []  # per model call: one tile each unless tile_batch > 1
+
+    @contextmanager
+    def stage(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.ms[name] = self.ms.get(name, 0.0) + seconds * 1000
+
+    @contextmanager
+    def forward(self):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t
+            self.add("forward", dt)
+            self.forward_calls.append(round(dt * 1000, 3))
+
+    def as_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {f"{k}_ms": round(self.ms[k], 3) for k in STAGES if k in self.ms}
+        if self.forward_calls:
+            out["forward_calls_ms"] = self.forward_calls
+        out["total_ms"] = round((time.perf_counter() - self.t0) * 1000, 3)
+        return out
+
+    def log(self, what: str = "image") -> Dict[str, Any]:
+        d = self.as_dict()
+        if log.isEnabledFor(logging.INFO):
+            stages = " ".join(f"{k[:-3]}={v:.1f}" for k, v in d.items()
+                              if k.endswith("_ms") and k != "total_ms" and isinstance(v, float))
+            log.info("%s total=%.1fms %s forward_calls=%d", what, d["total_ms"], stages, len(self.forward_calls))
+        return d
+
+
+class _NullTimer(StageTimer):
+    """No-op stand-in so stage code needs no `if timer` checks."""
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    @contextmanager
+    def forward(self):
+        yield
+
+    def add(self, name: str, seconds: float) -> None:
+        pass
+
+NULL_TIMER = _NullTimer()
+
+
+def server_timing(timings: Dict[str, Any] | None, serialize_ms: float | None = None) -> str:
+    """Server-Timing header value (browser devtools show it per request)."""
+    parts = []
+    for k, v in (timings or {}).items():
+        if k.endswith("_ms") and isinstance(v, (int, float)):
+            parts.append(f"{k[:-3]};dur={v:.3f}")
+    if serialize_ms is not None:
+        parts.append(f"serialize;dur={serialize_ms:.3f}")
+    return ", ".join(parts)
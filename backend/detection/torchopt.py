@@ -0,0 +1,140 @@
+# detection/torchopt.py
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+from contextlib import nullcontext
+import os, time, logging
+import numpy as np
+import torch
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+# Opt-in CPU execution mode for the Ultralytics (torch) backend, applied once at model load
+# (YOLO_TORCH_OPTIMIZE=1): Conv+BN fused, channels_last weights and inputs, forward under
+# torch.inference_mode, optional bfloat16 autocast (YOLO_TORCH_BF16) and torch.compile
+# (YOLO_TORCH_COMPILE, Inductor cache persisted in YOLO_TORCH_COMPILE_CACHE_DIR). The model is
+# warmed up on YOLO_WARMUP_SHAPES and baseline vs optimized latency is reported per shape.
+
+_REPORT: Dict[str, Any] | None = None
+
+def bf16_supported() -> bool:
+    """CPU has native bfloat16 matmul/conv (AVX512-BF16 / AMX); emulated bf16 is slower than fp32."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        pass
+    try:
+        with open("/proc/cpuinfo") as fh:
+            flags = fh.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+def _to_float(y: Any) -> Any:
+    """bf16 outputs back to fp32 before Ultralytics' NMS/postprocess."""
+    if isinstance(y, torch.Tensor):
+        return y.float() if y.dtype == torch.bfloat16 else y
+    if isinstance(y, (list, tuple)):
+        return type(y)(_to_float(v) for v in y)
+    if isinstance(y, dict):
+        return {k: _to_float(v) for k, v in y.items()}
+    return y
+
+
+class FastForward(torch.nn.Module):
+    """Drop-in for AutoBackend.model: channels_last input, inference_mode, optional bf16 autocast."""
+
+    def __init__(self, net: torch.nn.Module, bf16: bool = False, compile: bool = False):
+        super().__init__()
+        self.eager = net
+        self.bf16 = bf16
+        self.net = torch.compile(net, dynamic=None) if compile else net
+
+    def forward(self, im, *args, **kwargs):
+        im = im.contiguous(memory_format=torch.channels_last)
+        amp = torch.autocast("cpu", dtype=torch.bfloat16) if self.bf16 else nullcontext()
+        with torch.inference_mode(), amp:
+            return _to_float(self.net(im, *args, **kwargs))
+
+    def __getattr__(self, name):
+        # stride, names, yaml, ... of the wrapped DetectionModel
+        try:
+            return super().__getattr__(name)
+        except AttributeError:
+            return getattr(self._modules["eager"], name)
+
+
+def parse_shapes(spec: str) -> List[Tuple[int, int]]:
+    """'640x640,1280x720' -> [(640, 640), (1280, 720)] (width x height of warm-up images)."""
+    out = []
+    for part in str(spec or "").split(","):
+        if "x" in part.lower():
+            w, h = part.lower().split("x", 1)
+            out.append((int(w), int(h)))
+    return out
+
+def _time_predict(model, img: np.ndarray, imgsz: int, device: str, repeat: int) -> float:
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        model.predict(source=img, imgsz=imgsz, device=device, verbose=False)
+        times.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(times))
+
+def optimize(model, device: str = "cpu") -> Dict[str, Any]:
+    """
+    Apply the configured optimizations to an ultralytics.YOLO in place and warm it up.
+    Returns (and keeps, see report()) the per-shape baseline/optimized latencies.
+    """
+    global _REPORT
+    bf16_cfg = str(getattr(settings, "YOLO_TORCH_BF16", "0")).lower()
+    bf16 = bf16_supported() if bf16_cfg == "auto" else bf16_cfg in ("1", "true", "yes")
+    do_compile = bool(getattr(settings, "YOLO_TORCH_COMPILE", False)) and hasattr(torch, "compile")
+    imgsz = int(getattr(settings, "YOLO_WARMUP_IMGSZ", 640))
+    repeat = int(getattr(settings, "YOLO_WARMUP_REPEAT", 3))
+    shapes = parse_shapes(getattr(settings, "YOLO_WARMUP_SHAPES", "640x640"))
+    rng = np.random.default_rng(0)
+    imgs = {s: rng.integers(0, 256, (s[1], s[0], 3), dtype=np.uint8) for s in shapes}
+
+    # the first predict builds Ultralytics' predictor (AutoBackend around model.model); baseline
+    # timings are taken on that untouched model
+    baseline: Dict[Tuple[int, int], float] = {}
+    for s, img in imgs.items():
+        model.predict(source=img, imgsz=imgsz, device=device, verbose=False)
+        baseline[s] = _time_predict(model, img, imgsz, device, repeat)
+
+    t0 = time.perf_counter()
+    model.fuse()  # Conv+BN (no-op when AutoBackend already fused)
+    net = model.model.eval().to(memory_format=torch.channels_last)
+    if do_compile:
+        cache_dir = getattr(settings, "YOLO_TORCH_COMPILE_CACHE_DIR", "")
+        if cache_dir:
+            # Inductor's on-disk FX graph / kernel cache: later workers and restarts reuse compiled code
+            os.makedirs(cache_dir, exist_ok=True)
+            os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", cache_dir)
+            os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    fast = FastForward(net, bf16=bf16, compile=do_compile)
+    predictor = getattr(model, "predictor", None)
+    if predictor is not None and getattr(predictor, "model", None) is not None:
+        predictor.model.model = fast
+    else:
+        log.warning("No Ultralytics predictor to patch; only fuse/channels_last applied")
+    setup_ms = (time.perf_counter() - t0) * 1000
+
+    per_shape = []
+    for s, img in imgs.items():
+        t1 = time.perf_counter()
+        model.predict(source=img, imgsz=imgsz, device=device, verbose=False)  # compiles per shape
+        warm = (time.perf_counter() - t1) * 1000
+        opt = _time_predict(model, img, imgsz, device, repeat)
+        per_shape.append({"shape": f"{s[0]}x{s[1]}", "imgsz": imgsz, "baseline_ms": round(baseline[s], 2),
+                          "optimized_ms": round(opt, 2), "speedup": round(baseline[s] / opt, 3) if opt else None,
+                          "warmup_ms": round(warm, 1)})
+        log.info("torch optimize %s@%d: %.1fms -> %.1fms (%.2fx, warm-up %.0fms)",
+                 per_shape[-1]["shape"], imgsz, baseline[s], opt, baseline[s] / opt if opt else 0, warm)
+    _REPORT = {"fused": True, "channels_last": True, "inference_mode": True, "bf16": bf16,
+               "compile": do_compile, "setup_ms": round(setup_ms, 1), "shapes": per_shape}
+    return _REPORT
+
+def report() -> Dict[str, Any] | None:
+    return _REPORT
@@ -1,9 +1,20 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
     path("detect/", views.DetectView.as_view(), name="detect"),
     path("detect/batch/", views.BatchDetectView.as_view(), name="detect-batch"),
+    path("detect/async/", views.AsyncDetectView.as_view(), name="detect-async"),
+    path("detect/batch/async/", views.AsyncBatchDetectView.as_view(), name="detect-batch-async"),
+    path("detect/rethreshold/", views.RethresholdView.as_view(), name="detect-rethreshold"),
+    path("artifacts/<str:name>", views.ArtifactView.as_view(), name="artifact"),
     path("model/current/", views.CurrentModelView.as_view(), name="model-current"),
+    path("model/pool/", views.ModelPoolStatsView.as_view(), name="model-pool"),
+    re_path(r"^metrics/?$", views.MetricsView.as_view(), name="metrics"),
     path("health/", views.HealthView.as_view(), name="health"),
+    path("runtime/", views.RuntimeView.as_view(), name="runtime"),
+    path("cache/", views.CacheStatsView.as_view(), name="cache-stats"),
+    path("jobs/", views.JobListView.as_view(), name="jobs"),
+    path("jobs/<int:pk>/", views.JobDetailView.as_view(), name="job-detail"),
+    path("scheduler/", views.SchedulerStatsView.as_view(), name="scheduler-stats"),
 ]
@@ -4,167 +4,334 @@ from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework import status
-from .detector import run_inference
+from .detector import run_inference, rethreshold
+from .scheduler import get_scheduler
+from .cache import result_cache
+from .artifacts import FORMATS, artifact_path
+from .renderers import DETECTION_RENDERERS, negotiated
+from .timing import server_timing, log as timing_log
+from . import metrics
 from .utils import merge_counts
-import io, zipfile, time
-from .models import YoloModel
+from .tiling import SCREEN_METHODS, SCREEN_OFF
+from .executors import Overloaded, InputError, inference_slot, acquire_slot, release_slot, run_in_inference_pool, infer_batch
+import io, json, zipfile, zlib, time, asyncio, logging
+from .models import YoloModel, DetectionJob
+from .jobs import create_job, cancel_job, job_progress, job_items
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse
+from django.views import View
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 
+log = logging.getLogger(__name__)
+
 IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+NDJSON = 'application/x-ndjson'
+NO_BATCH_INPUT = 'Upload images under field "images" (multiple allowed) or a ZIP under field "zip".'
 
-@method_decorator(csrf_exempt, name='dispatch')
-class CurrentModelView(APIView):
-    def get(self, request):
-        m = YoloModel.objects.filter(is_active=True).first()
-        if not m:
-            from django.conf import settings
-            p = getattr(settings, "YOLO_MODEL_PATH", None)
-            if not p:
-                return Response({"active": None}, status=status.HTTP_200_OK)
-            return Response({
-                "active": {
-                    "id": -1,
-                    "name": p.split("/")[-1],
-                    "date_built": None,
-                    "base_model": None,
-                    "num_params": None,
-                    "map": None,
-                    "map_5095": None,
-                    "size": None,
-                    "weights_path": p,
-                }
-            }, status=status.HTTP_200_OK)
-
-        return Response({
+# ------------------ shared request helpers (sync + async views) ------------------
+
+def _truthy(v) -> bool:
+    return str(v).lower() in ('1', 'true', 'yes')
+
+class BadParams(ValueError):
+    """A query parameter with an unsupported value; the views answer 400."""
+
+def _bad_params(e) -> dict:
+    return {"error": "Invalid query parameter", "detail": str(e)}
+
+def _screen_param(qp) -> str:
+    screen = str(qp.get('screen', getattr(settings, 'YOLO_TILE_SCREEN', ''))).lower()
+    if screen not in SCREEN_OFF + SCREEN_METHODS:
+        raise BadParams(f"screen={screen!r}; expected one of {', '.join(SCREEN_METHODS)} or off")
+    return screen
+
+def _image_format_param(qp) -> str:
+    fmt = str(qp.get('image_format', getattr(settings, 'YOLO_ANNOTATED_FORMAT', 'jpeg'))).lower()
+    if fmt not in FORMATS:
+        raise BadParams(f"image_format={fmt!r}; expected one of {', '.join(FORMATS)}")
+    return fmt
+
+def inference_params(qp) -> dict:
+    """run_inference kwargs from query params (DRF query_params or Django GET). Raises BadParams."""
+    return {
+        "conf": float(qp.get('conf', 0.25)),
+        "imgsz": int(qp.get('imgsz', 640)),
+        "device": qp.get('device', getattr(settings, 'DEFAULT_YOLO_DEVICE', 'auto')),
+        "annotate": _truthy(qp.get('annotate', '0')),
+        # tiling knobs
+        "tile": qp.get('tile', 'auto'),
+        "tile_size": int(qp.get('tile_size', 640)),
+        "overlap": float(qp.get('overlap', 0.20)),
+        "nms_iou": float(qp.get('nms_iou', 0.50)),
+        "tile_batch": int(qp.get('tile_batch', getattr(settings, 'YOLO_TILE_BATCH', 1))),
+        "screen": _screen_param(qp),
+        # annotated image delivery
+        "image_format": _image_format_param(qp),
+        "image_url": _truthy(qp.get('image_url', getattr(settings, 'YOLO_ANNOTATED_URL', False))),
+        "max_dim": int(qp.get('max_dim', getattr(settings, 'YOLO_ANNOTATED_MAX_DIM', 0))),
+        # per-stage timing breakdown in the payload (always logged)
+        "timings": _truthy(qp.get('timings', getattr(settings, 'YOLO_RESPONSE_TIMINGS', False))),
+    }
+
+def batch_inputs(files_in, zip_file, limit):
+    """
+    Case A) multiple files via <input multiple name="images">
+    Case B) one ZIP via field name "zip"
+    Returns (count, lazy iterator of (name, file-like)). For a ZIP only the central directory is
+    read here and `limit` applies before extraction; each entry is decompressed when the iterator
+    reaches it, so memory holds one image at a time. Raises zipfile.BadZipFile & co. on a
+    broken archive; a corrupt entry comes out as an InputError in place of its file.
+    """
+    files = list(files_in)[:limit]
+    if files or not zip_file:
+        return len(files), ((getattr(f, 'name', 'image'), f) for f in files)
+
+    z = zipfile.ZipFile(zip_file)
+    infos = [
+        info for info in z.infolist()
+        if not info.is_dir() and info.filename.lower().endswith(tuple(IMAGE_EXTS))
+    ][:limit]
+
+    def _entries():
+        with z:
+            for info in infos:
+                try:
+                    with z.open(info) as f:
+                        data = io.BytesIO(f.read())  # wrap bytes for detector
+                except (zipfile.BadZipFile, zlib.error, OSError, EOFError, NotImplementedError, RuntimeError) as e:
+                    # bad CRC / truncated / unsupported compression / encrypted: that item fails alone
+                    yield info.filename, InputError(f"Invalid ZIP entry: {e}")
+                    continue
+                data.name = info.filename
+                yield info.filename, data
+
+    return len(infos), _entries()
+
+def batch_item(name, res) -> dict:
+    item = {
+        "name": name,
+        "image": res.get("image"),
+        "inference_ms": res.get("inference_ms"),
+        "counts": res.get("counts"),
+        "total": res.get("total"),
+        "detections": res.get("detections"),
+        "image_b64": res.get("image_b64"),
+        "image_url": res.get("image_url"),
+        "tiling": res.get("tiling"),
+    }
+    if "timings" in res:
+        item["timings"] = res["timings"]
+    return item
+
+def batch_outcome(name, res, err, collection_counts):
+    """Per-image entry for one infer_batch outcome; folds its counts in. Returns (item, objects)."""
+    if err is not None:
+        return {"name": name, "error": err}, 0
+    merge_counts(collection_counts, res.get('counts', {}))
+    return batch_item(name, res), int(res.get('total', 0))
+
+def batch_payload(params, n_images, items, collection_counts, total_objects, elapsed_s, pipeline=None) -> dict:
+    collection = {
+        "counts": collection_counts,
+        "total": total_objects,
+        "inference_ms_total": int(elapsed_s * 1000),
+    }
+    if pipeline:
+        collection["pipeline"] = pipeline  # per-stage busy time & occupancy
+    return {
+        "params": {"conf": params["conf"], "imgsz": params["imgsz"], "device": params["device"], "images": n_images},
+        "items": items,  # per-image
+        "collection": collection,
+    }
+
+def active_model_info():
+    m = YoloModel.objects.filter(is_active=True).first()
+    if not m:
+        p = getattr(settings, "YOLO_MODEL_PATH", None)
+        if not p:
+            return {"active": None}
+        return {
             "active": {
-                "id": m.id,
-                "name": m.name,
-                "date_built": m.date_built,
-                "base_model": m.base_model,
-                "num_params": m.num_params,
-                "map": m.map,
-                "map_5095": m.map_5095,
-                "size": m.size,
-                "weights_path": m.weights_path,
+                "id": -1,
+                "name": p.split("/")[-1],
+                "date_built": None,
+                "base_model": None,
+                "num_params": None,
+                "map": None,
+                "map_5095": None,
+                "size": None,
+                "weights_path": p,
             }
-        }, status=status.HTTP_200_OK)
+        }
+    return {
+        "active": {
+            "id": m.id,
+            "name": m.name,
+            "date_built": m.date_built,
+            "base_model": m.base_model,
+            "num_params": m.num_params,
+            "map": m.map,
+            "map_5095": m.map_5095,
+            "size": m.size,
+            "weights_path": m.weights_path,
+            "int8": {
+                "path": m.int8_path,
+                "serving": m.serve_int8,
+                "fp32_latency_ms": m.fp32_latency_ms,
+                "int8_latency_ms": m.int8_latency_ms,
+                "map_delta": m.int8_map_delta,
+                "map_5095_delta": m.int8_map_5095_delta,
+            } if m.int8_path else None,
+        }
+    }
+
+def _ndjson(obj) -> bytes:
+    return (json.dumps(obj, cls=DjangoJSONEncoder) + "\n").encode("utf-8")
+
+def ndjson_summary(params, n_images, collection_counts, total_objects, elapsed_s, pipeline=None, error=None) -> bytes:
+    summary = batch_payload(params, n_images, None, collection_counts, total_objects, elapsed_s, pipeline)
+    del summary["items"]
+    if error is not None:
+        summary["error"] = error  # the batch stopped early; counts cover the items streamed before it
+    return _ndjson({"type": "summary", **summary})
+
+def ndjson_item(item) -> bytes:
+    return _ndjson({"type": "item", **item})
+
+def ndjson_batch(params, n_images, inputs, t0):
+    """
+    ?stream=1: one {"type": "item", ...} line per image as it finishes, then one summary line.
+    If reading the inputs fails mid-batch, an error item and a summary with "error" end the stream.
+    """
+    collection_counts = {}
+    total_objects = 0
+    pipeline_stats = {}
+    error = None
+    try:
+        for name, res, err in infer_batch(inputs, params, pipeline_stats):
+            item, n = batch_outcome(name, res, err, collection_counts)
+            total_objects += n
+            yield ndjson_item(item)
+    except Exception as e:
+        log.exception("Streaming batch aborted")
+        error = str(e)
+        yield ndjson_item({"name": None, "error": error})
+    yield ndjson_summary(params, n_images, collection_counts, total_objects, time.time() - t0, pipeline_stats, error)
+
+def streaming_response(content) -> StreamingHttpResponse:
+    resp = StreamingHttpResponse(content, content_type=NDJSON)
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # nginx: pass lines through as they are produced
+    return resp
+
+# ------------------ views ------------------
+
+def _serialized(response, data, seconds):
+    """Log the serialization time and expose all stage timings as a Server-Timing header."""
+    ms = seconds * 1000
+    timings = data.get("timings") if isinstance(data, dict) else None
+    response["Server-Timing"] = server_timing(timings, ms)
+    timing_log.info("serialize %s %.1fms %d bytes", response.get("Content-Type"), ms, len(response.content))
+    return response
+
+class TimedRenderMixin:
+    """DRF views: render eagerly in finalize_response so serialization gets timed too."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, Response) and not response.is_rendered:
+            t0 = time.perf_counter()
+            response.render()
+            _serialized(response, response.data, time.perf_counter() - t0)
+        return response
+
+def _active_model_info_off_loop():
+    # runs on a plain worker thread, not Django's shared sync thread, so it never queues
+    # behind sync views; that thread's DB connection is closed right after
+    try:
+        return active_model_info()
+    finally:
+        connection.close()
+
+@method_decorator(csrf_exempt, name='dispatch')
+class CurrentModelView(View):
+    async def get(self, request):
+        return JsonResponse(await asyncio.to_thread(_active_model_info_off_loop))
 
 @method_decorator(csrf_exempt, name='dispatch')
-class BatchDetectView(APIView):
+class BatchDetectView(TimedRenderMixin, APIView):
     parser_classes = (MultiPartParser, FormParser)
+    renderer_classes = DETECTION_RENDERERS
 
     def post(self, request, *args, **kwargs):
-        conf = float(request.query_params.get('conf', 0.25))
-        imgsz = int(request.query_params.get('imgsz', 640))
-        device = request.query_params.get('device', getattr(settings, 'DEFAULT_YOLO_DEVICE', 'auto'))
-        annotate = str(request.query_params.get('annotate', '0')).lower() in ('1','true','yes')
-
-        # NEW: tiling knobs
-        tile = request.query_params.get('tile', 'auto')
-        tile_size = int(request.query_params.get('tile_size', 640))
-        overlap = float(request.query_params.get('overlap', 0.20))
-        nms_iou = float(request.query_params.get('nms_iou', 0.50))
+        try:
+            params = inference_params(request.query_params)
+        except BadParams as e:
+            return Response(_bad_params(e), status=status.HTTP_400_BAD_REQUEST)
 
         items = []
         collection_counts = {}
         total_objects = 0
         t0 = time.time()
 
-        # Case A) multiple files via <input multiple name="images">
-        files = list(request.FILES.getlist('images'))
+        # Hard limit (avoid accidental huge batches)
+        max_imgs = int(request.query_params.get('max', 200))
 
-        # Case B) one ZIP via field name "zip"
-        zip_file = request.FILES.get('zip')
-        if zip_file and not files:
-            try:
-                with zipfile.ZipFile(zip_file) as z:
-                    for info in z.infolist():
-                        if info.is_dir():
-                            continue
-                        name_lower = info.filename.lower()
-                        if not any(name_lower.endswith(ext) for ext in IMAGE_EXTS):
-                            continue
-                        with z.open(info) as f:
-                            data = io.BytesIO(f.read())  # wrap bytes for detector
-                            data.name = info.filename
-                            files.append(data)
-            except Exception as e:
-                return Response(
-                    {"error": "Invalid ZIP archive", "detail": str(e)},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        if not files:
+        try:
+            n_images, inputs = batch_inputs(request.FILES.getlist('images'), request.FILES.get('zip'), max_imgs)
+        except Exception as e:
             return Response(
-                {"error": 'Upload images under field "images" (multiple allowed) or a ZIP under field "zip".'},
+                {"error": "Invalid ZIP archive", "detail": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Hard limit (avoid accidental huge batches)
-        max_imgs = int(request.query_params.get('max', 200))
-        files = files[:max_imgs]
+        if not n_images:
+            return Response({"error": NO_BATCH_INPUT}, status=status.HTTP_400_BAD_REQUEST)
 
-        for f in files:
-            name = getattr(f, 'name', 'image')
-            try:
-                res = run_inference(
-                    f, conf=conf, imgsz=imgsz, device=device, annotate=annotate,
-                    tile=tile, tile_size=tile_size, overlap=overlap, nms_iou=nms_iou
-                )
-                merge_counts(collection_counts, res.get('counts', {}))
-                total_objects += int(res.get('total', 0))
-                items.append({
-                    "name": name,
-                    "image": res.get("image"),
-                    "inference_ms": res.get("inference_ms"),
-                    "counts": res.get("counts"),
-                    "total": res.get("total"),
-                    "detections": res.get("detections"),
-                    "image_b64": res.get("image_b64"),
-                })
-            except Exception as e:
-                items.append({"name": name, "error": str(e)})
+        if _truthy(request.query_params.get('stream', '0')):
+            if _is_asgi(request):
+                # Django reads a sync iterator to the end before sending anything on ASGI
+                try:
+                    return ndjson_async_response(params, n_images, inputs, t0)
+                except Overloaded as e:
+                    return Response({"error": "Server busy", "detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            return streaming_response(ndjson_batch(params, n_images, inputs, t0))
 
+        pipeline_stats = {}
+        for name, res, err in infer_batch(inputs, params, pipeline_stats):
+            item, n = batch_outcome(name, res, err, collection_counts)
+            total_objects += n
+            items.append(item)
 
         t1 = time.time()
-        return Response({
-            "params": {"conf": conf, "imgsz": imgsz, "device": device, "images": len(files)},
-            "items": items,  # per-image
-            "collection": {
-                "counts": collection_counts,
-                "total": total_objects,
-                "inference_ms_total": int((t1 - t0) * 1000),
-            }
-        }, status=status.HTTP_200_OK)
+        return Response(
+            batch_payload(params, n_images, items, collection_counts, total_objects, t1 - t0, pipeline_stats),
+            status=status.HTTP_200_OK
+        )
 
 @method_decorator(csrf_exempt, name='dispatch')
-class DetectView(APIView):
+class DetectView(TimedRenderMixin, APIView):
     parser_classes = (MultiPartParser, FormParser)
+    renderer_classes = DETECTION_RENDERERS
 
     def post(self, request, *args, **kwargs):
         if 'image' not in request.FILES:
             return Response({"error": 'No image uploaded. Use form field name "image".'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        conf = float(request.query_params.get('conf', 0.25))
-        imgsz = int(request.query_params.get('imgsz', 640))
-        device = request.query_params.get('device', getattr(settings, 'DEFAULT_YOLO_DEVICE', 'auto'))
-        annotate = str(request.query_params.get('annotate', '0')).lower() in ('1','true','yes')
-
-        # NEW: tiling knobs
-        tile = request.query_params.get('tile', 'auto')
-        tile_size = int(request.query_params.get('tile_size', 640))
-        overlap = float(request.query_params.get('overlap', 0.20))
-        nms_iou = float(request.query_params.get('nms_iou', 0.50))
+        try:
+            params = inference_params(request.query_params)
+        except BadParams as e:
+            return Response(_bad_params(e), status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            data = run_inference(
-                request.FILES['image'],
-                conf=conf, imgsz=imgsz, device=device, annotate=annotate,
-                tile=tile, tile_size=tile_size, overlap=overlap, nms_iou=nms_iou
-            )
+            data = run_inference(request.FILES['image'], keep_raw=_truthy(request.query_params.get('keep_raw', '0')), **params)
             return Response(data, status=status.HTTP_200_OK)
+        except Overloaded as e:
+            return Response({"error": "Server busy", "detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             payload = {"error": "Model inference failed"}
             if getattr(settings, "DEBUG", False):
@@ -172,6 +339,269 @@ class DetectView(APIView):
             return Response(payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HealthView(APIView):
+class RethresholdView(TimedRenderMixin, APIView):
+    """New conf / nms_iou over the raw detections of a ?keep_raw=1 result, without re-inference."""
+    renderer_classes = DETECTION_RENDERERS
+
+    def get(self, request):
+        qp = request.query_params
+        res = rethreshold(qp.get('token', ''), conf=float(qp.get('conf', 0.25)), nms_iou=float(qp.get('nms_iou', 0.50)))
+        if res is None:
+            return Response({"error": "Unknown or expired result token; run detection again with keep_raw=1."},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(res, status=status.HTTP_200_OK)
+
+
+class ArtifactView(View):
+    """Annotated image stored by a request with ?image_url=1 (raw JPEG/WebP bytes)."""
+
+    def get(self, request, name):
+        found = artifact_path(name)
+        if found is None:
+            return JsonResponse({"error": "Artifact not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+        path, content_type = found
+        resp = FileResponse(open(path, 'rb'), content_type=content_type)
+        resp['Cache-Control'] = f"private, max-age={int(getattr(settings, 'YOLO_ARTIFACT_TTL_S', 3600))}"
+        return resp
+
+
+class MetricsView(View):
+    """Prometheus text exposition (all uvicorn workers when PROMETHEUS_MULTIPROC_DIR is set)."""
+
+    def get(self, request):
+        if not metrics.ENABLED:
+            return JsonResponse({"error": "Install prometheus_client to enable /api/metrics"},
+                                status=status.HTTP_501_NOT_IMPLEMENTED)
+        body, content_type = metrics.exposition()
+        return HttpResponse(body, content_type=content_type)
+
+
+class HealthView(View):
+    # async: stays responsive under ASGI while inference occupies the sync/worker threads
+    async def get(self, request):
+        return JsonResponse({'status': 'ok'})
+
+
+class SchedulerStatsView(APIView):
     def get(self, request):
-        return Response({'status': 'ok'})
+        sched = get_scheduler()
+        if sched is None:
+            return Response({"enabled": bool(getattr(settings, "YOLO_MICROBATCH", False)), "stats": None})
+        return Response({"enabled": True, "stats": sched.stats()})
+
+class ModelPoolStatsView(APIView):
+    """Replica checkouts, waits, timeouts and utilization of this worker's model pool."""
+    def get(self, request):
+        from . import detector
+        pool = detector._MODEL
+        return Response({"loaded": pool is not None, "stats": pool.stats() if pool is not None else None})
+
+class RuntimeView(APIView):
+    """This worker's CPU layout: thread budget, core pinning, what torch/OpenCV report."""
+    def get(self, request):
+        from .cpu import diagnostics
+        return Response(diagnostics())
+
+class CacheStatsView(APIView):
+    def get(self, request):
+        cache = result_cache()
+        return Response({"enabled": cache is not None, "stats": cache.stats() if cache else None})
+
+# ------------------ persistent batch jobs ------------------
+# Uploads go to disk and one queue row per image goes to the DB; `manage.py detection_worker`
+# processes drain the queue. Clients poll /api/jobs/<id>/ for progress and per-image results.
+
+@method_decorator(csrf_exempt, name='dispatch')
+class JobListView(APIView):
+    parser_classes = (MultiPartParser, FormParser)
+
+    def get(self, request):
+        limit = min(int(request.query_params.get('limit', 20)), 200)
+        jobs = DetectionJob.objects.all()[:limit]
+        return Response([
+            {"id": j.pk, "status": j.status, "images": j.num_items, "created_at": j.created_at}
+            for j in jobs
+        ])
+
+    def post(self, request, *args, **kwargs):
+        try:
+            params = inference_params(request.query_params)
+        except BadParams as e:
+            return Response(_bad_params(e), status=status.HTTP_400_BAD_REQUEST)
+        # no default cap: the job lives on disk, not in memory
+        max_imgs = int(request.query_params.get('max', getattr(settings, 'YOLO_JOB_MAX_IMAGES', 0)))
+
+        try:
+            job = create_job(request.FILES.getlist('images'), request.FILES.get('zip'), params, IMAGE_EXTS, max_imgs)
+        except ValueError:
+            return Response({"error": NO_BATCH_INPUT}, status=status.HTTP_400_BAD_REQUEST)
+        except zipfile.BadZipFile as e:
+            return Response(
+                {"error": "Invalid ZIP archive", "detail": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {"id": job.pk, "status": job.status, "images": job.num_items, "url": request.build_absolute_uri(f"{job.pk}/")},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+@method_decorator(csrf_exempt, name='dispatch')
+class JobDetailView(APIView):
+    renderer_classes = DETECTION_RENDERERS
+
+    def get(self, request, pk):
+        job = DetectionJob.objects.filter(pk=pk).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        offset = int(request.query_params.get('offset', 0))
+        limit = min(int(request.query_params.get('limit', 100)), 1000)
+        payload = job_progress(job)
+        payload["items"] = job_items(job, offset, limit)
+        payload["offset"], payload["limit"] = offset, limit
+        return Response(payload)
+
+    def delete(self, request, pk):
+        # cancel: pending items are no longer claimed; items already running finish normally
+        job_status = cancel_job(pk)
+        if job_status is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"id": pk, "status": job_status})
+
+# ------------------ async (ASGI) views ------------------
+# Uploads are parsed/read on a helper thread, run_inference runs on the bounded inference pool
+# (YOLO_INFERENCE_WORKERS); the event loop itself never blocks.
+
+def _read_upload(request):
+    f = request.FILES.get('image')
+    return None if f is None else f.read()
+
+def _batch_uploads(request, limit):
+    return batch_inputs(request.FILES.getlist('images'), request.FILES.get('zip'), limit)
+
+async def _ndjson_batch_async(params, n_images, inputs, t0):
+    it = ndjson_batch(params, n_images, inputs, t0)
+    try:
+        while True:
+            line = await run_in_inference_pool(next, it, None)
+            if line is None:
+                break
+            yield line
+    finally:
+        await run_in_inference_pool(it.close)
+
+class _SlotStream:
+    """
+    Async response body holding an inference slot the view already took. The slot is released
+    once, by whichever comes first: the stream ending (done, failed or cancelled) or Django
+    closing the response, which it also does when the body was never iterated.
+    """
+
+    def __init__(self, body):
+        self._body = body
+        self._held = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._body.__anext__()
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._held:
+            self._held = False
+            release_slot()
+
+    __del__ = close  # last resort if the response is dropped without close()
+
+def ndjson_async_response(params, n_images, inputs, t0) -> StreamingHttpResponse:
+    """?stream=1 under ASGI: lines produced on the inference pool, sent as each is ready. Raises Overloaded."""
+    acquire_slot()
+    return streaming_response(_SlotStream(_ndjson_batch_async(params, n_images, inputs, t0)))
+
+def _is_asgi(request) -> bool:
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+def _timed_json(request, payload):
+    t0 = time.perf_counter()
+    response = negotiated(request, payload) or JsonResponse(payload)
+    return _serialized(response, payload, time.perf_counter() - t0)
+
+def _overloaded(e):
+    return JsonResponse({"error": "Server busy", "detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncDetectView(View):
+    async def post(self, request, *args, **kwargs):
+        data = await asyncio.to_thread(_read_upload, request)
+        if data is None:
+            return JsonResponse({"error": 'No image uploaded. Use form field name "image".'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            params = inference_params(request.GET)
+        except BadParams as e:
+            return JsonResponse(_bad_params(e), status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            async with inference_slot():
+                res = await run_in_inference_pool(run_inference, data, keep_raw=_truthy(request.GET.get('keep_raw', '0')), **params)
+            return _timed_json(request, res)
+        except Overloaded as e:
+            return _overloaded(e)
+        except Exception as e:
+            payload = {"error": "Model inference failed"}
+            if getattr(settings, "DEBUG", False):
+                payload["detail"] = str(e)
+            return JsonResponse(payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncBatchDetectView(View):
+    async def post(self, request, *args, **kwargs):
+        try:
+            params = inference_params(request.GET)
+        except BadParams as e:
+            return JsonResponse(_bad_params(e), status=status.HTTP_400_BAD_REQUEST)
+
+        items = []
+        collection_counts = {}
+        total_objects = 0
+        t0 = time.time()
+
+        # Hard limit (avoid accidental huge batches)
+        max_imgs = int(request.GET.get('max', 200))
+
+        try:
+            n_images, inputs = await asyncio.to_thread(_batch_uploads, request, max_imgs)
+        except Exception as e:
+            return JsonResponse({"error": "Invalid ZIP archive", "detail": str(e)},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        if not n_images:
+            return JsonResponse({"error": NO_BATCH_INPUT}, status=status.HTTP_400_BAD_REQUEST)
+
+        if _truthy(request.GET.get('stream', '0')):
+            try:
+                return ndjson_async_response(params, n_images, inputs, t0)
+            except Overloaded as e:
+                return _overloaded(e)
+
+        try:
+            async with inference_slot():
+                pipeline_stats = {}
+                outcomes = await run_in_inference_pool(lambda: list(infer_batch(inputs, params, pipeline_stats)))
+        except Overloaded as e:
+            return _overloaded(e)
+
+        for name, res, err in outcomes:
+            item, n = batch_outcome(name, res, err, collection_counts)
+            total_objects += n
+            items.append(item)
+
+        t1 = time.time()
+        payload = batch_payload(params, n_images, items, collection_counts, total_objects, t1 - t0, pipeline_stats)
+        return _timed_json(request, payload)
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'detection.metrics.MetricsMiddleware',  # request counts/latency for /api/metrics
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -63,6 +64,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # web processes and job workers share the file; wait for locks instead of failing
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -82,9 +85,129 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Force CPU for inference
 DEFAULT_YOLO_DEVICE = os.getenv("DEFAULT_YOLO_DEVICE", "cpu")
 
+# Tiles per forward pass in tiled mode (1 = one predict call per tile)
+YOLO_TILE_BATCH = int(os.getenv("YOLO_TILE_BATCH", "1"))
+# Shift last tile row/column flush with the image edge (no sliver tiles)
+YOLO_TILE_ALIGN_EDGES = os.getenv("YOLO_TILE_ALIGN_EDGES", "1").lower() in ("1", "true", "yes")
+# Pad short tiles (images smaller than tile_size) to a fixed tile_size x tile_size shape
+YOLO_TILE_PAD = os.getenv("YOLO_TILE_PAD", "0").lower() in ("1", "true", "yes")
+# Skip tiles a cheap downsampled check finds empty: "std" (gray-level std-dev) or "edges"
+# (Canny edge density); "" = off. Each method has its own threshold, in its own unit.
+YOLO_TILE_SCREEN = os.getenv("YOLO_TILE_SCREEN", "")
+YOLO_TILE_SCREEN_STD_THRESHOLD = float(os.getenv("YOLO_TILE_SCREEN_STD_THRESHOLD", "4.0"))      # gray levels
+YOLO_TILE_SCREEN_EDGE_FRACTION = float(os.getenv("YOLO_TILE_SCREEN_EDGE_FRACTION", "0.0005"))  # edge pixels / tile pixels
+YOLO_TILE_SCREEN_SCALE = int(os.getenv("YOLO_TILE_SCREEN_SCALE", "8"))   # downsample factor
+# tile=coarse: one downscaled whole-image pass at min(conf, YOLO_COARSE_CONF); only tiles within
+# YOLO_COARSE_MARGIN x box size of its detections get full-resolution inference
+YOLO_COARSE_CONF = float(os.getenv("YOLO_COARSE_CONF", "0.10"))
+YOLO_COARSE_MARGIN = float(os.getenv("YOLO_COARSE_MARGIN", "0.5"))
+
 # Static (if you’ll serve the built React through Django later)
 STATIC_URL = "static/"
 STATIC_ROOT = Path(BASE_DIR) / "staticfiles"
 
 # ...
-YOLO_MODEL_PATH = os.getenv('YOLO_MODEL_PATH', str(BASE_DIR / 'weights' / 'best.pt'))
\ No newline at end of file
+YOLO_MODEL_PATH = os.getenv('YOLO_MODEL_PATH', str(BASE_DIR / 'weights' / 'best.pt'))
+
+# Inference backend: "torch" (Ultralytics/PyTorch) or "onnx" (ONNX Runtime, CPU)
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "torch")
+# Where exported model variants (ONNX, ...) are cached, keyed by weights hash
+YOLO_EXPORT_CACHE_DIR = os.getenv("YOLO_EXPORT_CACHE_DIR", str(BASE_DIR / "weights" / "cache"))
+# ONNX Runtime intra-op threads (0 = runtime default)
+YOLO_ONNX_THREADS = int(os.getenv("YOLO_ONNX_THREADS", "0"))
+# Serve the active YoloModel's INT8 variant when it has serve_int8 set (manage.py quantize_model);
+# 0 = always serve the FP32 weights
+YOLO_SERVE_INT8 = os.getenv("YOLO_SERVE_INT8", "1").lower() in ("1", "true", "yes")
+
+# Per-worker CPU budget (applied at startup by asgi.py / wsgi.py / detection_worker):
+# YOLO_CPU_BUDGET cores (0 = all available) are split across YOLO_SERVER_WORKERS processes
+# (match uvicorn --workers). YOLO_TORCH_THREADS overrides the per-worker intra-op thread count
+# (0 = budget // workers). YOLO_CPU_AFFINITY pins each worker to its own cores (Linux); workers
+# claim a slot via lock files in YOLO_CPU_SLOT_DIR.
+YOLO_SERVER_WORKERS = int(os.getenv("YOLO_SERVER_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+YOLO_CPU_BUDGET = int(os.getenv("YOLO_CPU_BUDGET", "0"))
+YOLO_TORCH_THREADS = int(os.getenv("YOLO_TORCH_THREADS", "0"))
+YOLO_TORCH_INTEROP_THREADS = int(os.getenv("YOLO_TORCH_INTEROP_THREADS", "1"))
+YOLO_CPU_AFFINITY = os.getenv("YOLO_CPU_AFFINITY", "0").lower() in ("1", "true", "yes")
+YOLO_CPU_SLOT_DIR = os.getenv("YOLO_CPU_SLOT_DIR", str(BASE_DIR / "run"))
+
+# Optimized CPU execution for the torch backend, applied once at model load: Conv+BN fusion,
+# channels_last, inference_mode; optional bfloat16 autocast (1 / 0 / auto = if the CPU has
+# native bf16) and torch.compile (compiled kernels cached in YOLO_TORCH_COMPILE_CACHE_DIR).
+# The model is warmed up on YOLO_WARMUP_SHAPES (WxH images at YOLO_WARMUP_IMGSZ) and the
+# speedup per shape is logged and shown at /api/runtime/. YOLO_WARMUP loads the model at
+# worker startup instead of on the first request (default: on with YOLO_TORCH_OPTIMIZE).
+YOLO_TORCH_OPTIMIZE = os.getenv("YOLO_TORCH_OPTIMIZE", "0").lower() in ("1", "true", "yes")
+YOLO_TORCH_BF16 = os.getenv("YOLO_TORCH_BF16", "0").lower()
+YOLO_TORCH_COMPILE = os.getenv("YOLO_TORCH_COMPILE", "0").lower() in ("1", "true", "yes")
+YOLO_TORCH_COMPILE_CACHE_DIR = os.getenv("YOLO_TORCH_COMPILE_CACHE_DIR", str(BASE_DIR / "weights" / "cache" / "inductor"))
+YOLO_WARMUP_SHAPES = os.getenv("YOLO_WARMUP_SHAPES", "640x640")
+YOLO_WARMUP_IMGSZ = int(os.getenv("YOLO_WARMUP_IMGSZ", "640"))
+YOLO_WARMUP_REPEAT = int(os.getenv("YOLO_WARMUP_REPEAT", "3"))
+YOLO_WARMUP = os.getenv("YOLO_WARMUP", "1" if YOLO_TORCH_OPTIMIZE else "0").lower() in ("1", "true", "yes")
+
+# Model replicas per process: each forward pass checks one out, so up to N run in parallel
+# (YOLO_INFERENCE_WORKERS threads, batch pipeline, ...). Waiting longer than TIMEOUT_S for a free
+# replica fails the request with 503 (0 = wait indefinitely). Replicas share the worker's torch
+# threads (YOLO_TORCH_THREADS), and each holds its own copy of the weights.
+YOLO_MODEL_POOL_SIZE = int(os.getenv("YOLO_MODEL_POOL_SIZE", "1"))
+YOLO_MODEL_POOL_TIMEOUT_S = float(os.getenv("YOLO_MODEL_POOL_TIMEOUT_S", "30"))
+
+# Cross-request micro-batching: one forward pass per batch of up to MAX_BATCH images/tiles,
+# waiting at most MAX_WAIT_MS for the batch to fill
+YOLO_MICROBATCH = os.getenv("YOLO_MICROBATCH", "0").lower() in ("1", "true", "yes")
+YOLO_MICROBATCH_MAX_BATCH = int(os.getenv("YOLO_MICROBATCH_MAX_BATCH", "8"))
+YOLO_MICROBATCH_MAX_WAIT_MS = float(os.getenv("YOLO_MICROBATCH_MAX_WAIT_MS", "5"))
+
+# Async (ASGI) detect endpoints: run_inference thread pool size, and how many requests may be
+# running + queued on it before new ones get 503 (0 = unlimited)
+YOLO_INFERENCE_WORKERS = int(os.getenv("YOLO_INFERENCE_WORKERS", "2"))
+YOLO_INFERENCE_MAX_PENDING = int(os.getenv("YOLO_INFERENCE_MAX_PENDING", "0"))
+
+# Batch endpoints: fan images out over this many worker processes (0 = sequential, in-request).
+# Workers fork after the model is loaded and share its weights copy-on-write.
+YOLO_BATCH_PROCESSES = int(os.getenv("YOLO_BATCH_PROCESSES", "0"))
+
+# Batch endpoints (single process): overlap decode, model and annotate/encode stages.
+# DEPTH bounds how many decoded images may wait for the model (and for encoding).
+YOLO_BATCH_PIPELINE = os.getenv("YOLO_BATCH_PIPELINE", "0").lower() in ("1", "true", "yes")
+YOLO_PIPELINE_DECODE_WORKERS = int(os.getenv("YOLO_PIPELINE_DECODE_WORKERS", "2"))
+YOLO_PIPELINE_POST_WORKERS = int(os.getenv("YOLO_PIPELINE_POST_WORKERS", "2"))
+YOLO_PIPELINE_DEPTH = int(os.getenv("YOLO_PIPELINE_DEPTH", "4"))
+
+# Result cache: identical upload + weights + params returns the stored payload (per process)
+YOLO_RESULT_CACHE_MB = float(os.getenv("YOLO_RESULT_CACHE_MB", "0"))    # opt-in; 0 disables
+YOLO_RESULT_CACHE_TTL_S = float(os.getenv("YOLO_RESULT_CACHE_TTL_S", "3600"))  # 0 = no expiry
+
+# Raw (pre-NMS) detections kept for /api/detect/rethreshold/ (detect with ?keep_raw=1)
+YOLO_RAW_FLOOR_CONF = float(os.getenv("YOLO_RAW_FLOOR_CONF", "0.05"))
+YOLO_RAW_STORE_DIR = Path(os.getenv("YOLO_RAW_STORE_DIR", BASE_DIR / "raw"))
+YOLO_RAW_STORE_TTL_S = float(os.getenv("YOLO_RAW_STORE_TTL_S", "3600"))
+
+# Annotated images: base64 in the JSON (default) or ?image_url=1 -> short-lived file under
+# YOLO_ARTIFACT_DIR served from /api/artifacts/<name>
+YOLO_ANNOTATED_FORMAT = os.getenv("YOLO_ANNOTATED_FORMAT", "jpeg")        # jpeg | webp
+YOLO_ANNOTATED_URL = os.getenv("YOLO_ANNOTATED_URL", "0").lower() in ("1", "true", "yes")
+YOLO_ANNOTATED_MAX_DIM = int(os.getenv("YOLO_ANNOTATED_MAX_DIM", "0"))    # 0 = full resolution
+YOLO_ARTIFACT_DIR = Path(os.getenv("YOLO_ARTIFACT_DIR", BASE_DIR / "artifacts"))
+YOLO_ARTIFACT_TTL_S = float(os.getenv("YOLO_ARTIFACT_TTL_S", "3600"))
+
+# Per-stage timings (read/decode/tiling/forward/boxes/nms/draw/encode/...) in every payload;
+# per request with ?timings=1. Always logged on the "detection.timing" logger.
+YOLO_RESPONSE_TIMINGS = os.getenv("YOLO_RESPONSE_TIMINGS", "0").lower() in ("1", "true", "yes")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        # detection.* incl. detection.timing (per-image stage breakdown)
+        "detection": {"handlers": ["console"], "level": os.getenv("YOLO_LOG_LEVEL", "INFO")},
+    },
+}
+
+# Persistent batch jobs (POST /api/jobs/, drained by `manage.py detection_worker`)
+YOLO_JOBS_DIR = Path(os.getenv("YOLO_JOBS_DIR", BASE_DIR / "jobs"))
+YOLO_JOB_MAX_IMAGES = int(os.getenv("YOLO_JOB_MAX_IMAGES", "0"))      # 0 = no cap
+YOLO_JOB_STALE_S = float(os.getenv("YOLO_JOB_STALE_S", "900"))        # requeue items of dead workers
+YOLO_JOB_HEARTBEAT_S = float(os.getenv("YOLO_JOB_HEARTBEAT_S", "30"))  # workers refresh their claims this often
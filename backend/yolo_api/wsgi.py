@@ -3,3 +3,11 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yolo_api.settings')
 application = get_wsgi_application()
+
+# per-worker torch/OpenMP thread budget and optional core pinning (YOLO_SERVER_WORKERS, YOLO_CPU_*)
+from detection.cpu import configure_worker
+configure_worker()
+
+# YOLO_WARMUP: load + warm the model now rather than on the first request
+from detection.detector import warm_start
+warm_start()
@@ -13,11 +13,20 @@ set "YOLO_MODEL_PATH=C:/Users/pc/object-detection/backend/weights/best.pt"
 set "DEFAULT_YOLO_DEVICE=cpu"
 set "CUDA_VISIBLE_DEVICES="
 
+REM Worker count; each worker gets an equal share of the cores for torch threads
+REM (set YOLO_CPU_AFFINITY=1 to pin workers to disjoint cores on Linux)
+set "YOLO_SERVER_WORKERS=4"
+
 REM Change to backend directory
 cd /d "%WORKING_DIR%"
 
+REM Shared metrics directory for all uvicorn workers (/api/metrics); start empty on every launch
+set "PROMETHEUS_MULTIPROC_DIR=%WORKING_DIR%\prometheus_multiproc"
+if exist "%PROMETHEUS_MULTIPROC_DIR%" rmdir /s /q "%PROMETHEUS_MULTIPROC_DIR%"
+mkdir "%PROMETHEUS_MULTIPROC_DIR%"
+
 REM Start uvicorn directly with the Python executable
 echo Starting Uvicorn server...
-"%PYTHON_EXE%" -m uvicorn yolo_api.asgi:application --host 0.0.0.0 --port 8000 --workers 4 --timeout-keep-alive 120
+"%PYTHON_EXE%" -m uvicorn yolo_api.asgi:application --host 0.0.0.0 --port 8000 --workers %YOLO_SERVER_WORKERS% --timeout-keep-alive 120
 
 echo Uvicorn process ended
\ No newline at end of file
@@ -0,0 +1,20 @@
+@echo off
+setlocal EnableDelayedExpansion
+
+echo Starting YOLO job worker...
+
+REM Same interpreter and environment as start-backend.bat
+set "PYTHON_EXE=C:\Users\pc\.conda\envs\yolo_cpu\python.exe"
+set "WORKING_DIR=C:\Users\pc\object-detection\backend"
+
+set "DJANGO_SETTINGS_MODULE=yolo_api.settings"
+set "YOLO_MODEL_PATH=C:/Users/pc/object-detection/backend/weights/best.pt"
+set "DEFAULT_YOLO_DEVICE=cpu"
+set "CUDA_VISIBLE_DEVICES="
+
+cd /d "%WORKING_DIR%"
+
+REM Start more copies of this script for more parallel workers
+"%PYTHON_EXE%" manage.py detection_worker
+
+echo Worker process ended